@@ -30,6 +30,16 @@ from modules.constants import getConstants
 
 # Functions
 
+def positiveInt(value):
+    """ Argument type: integer greater than 0 """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"invalid positive int value: '{value}'")
+    return number
+
 
 # Args parser
 
@@ -19,12 +19,19 @@
 
 # Global modules
 
+import asyncio
+import atexit
+import base64
+import collections
 import getpass
+import io
 import logging
 from   pathlib import Path
 import socket
 import subprocess
+import threading
 import types
+import uuid
 
 
 # Local modules
@@ -38,6 +45,39 @@ from modules.messages import (
 
 # Classes
 
+class OutputCapture():
+    """ Bounded capture of command output
+
+        Keeps the first and the last <maxLines> lines of the output
+        and counts the total number of lines and bytes.
+    """
+
+    def __init__(self, maxLines=100):
+        self._head     = []
+        self._tail     = collections.deque(maxlen=maxLines)
+        self._maxLines = maxLines
+
+        self.numLines = 0
+        self.numBytes = 0
+
+    def __str__(self):
+        lines = self._head
+        skipped = self.numLines - len(self._head) - len(self._tail)
+        if skipped > 0:
+            lines = lines + [f'... <{skipped} line(s) skipped> ...']
+        return '\n'.join(lines + list(self._tail)).strip()
+
+    def add(self, line, numBytes=None):
+        """ Add a line of output; numBytes is the size of the undecoded line
+            including the line terminator (default: size of line encoded as UTF-8 + 1) """
+        self.numLines += 1
+        self.numBytes += numBytes if numBytes is not None else len(line.encode()) + 1
+        if len(self._head) < self._maxLines:
+            self._head.append(line)
+        else:
+            self._tail.append(line)
+
+
 class Command():
     """ Execute a command """
 
@@ -126,6 +166,220 @@ class CmdShell(Command):
 
         return result
 
+    def runStream(self, cmd, onLine=None, secrets=None, rcOk=(0,), dryRun=False, maxLines=100):
+        """ Execute a local shell command processing its output line by line
+
+            Each line of stdout (without trailing newline) is passed to onLine
+            as soon as it is available. Only the first and the last <maxLines>
+            lines of stdout and stderr are kept in the result. Additionally the
+            result contains the total number of stdout lines and bytes
+            (attributes outLines and outBytes).
+        """
+        # pylint: disable=too-many-arguments
+
+        result = super().run(cmd, secrets=secrets, rcOk=rcOk, dryRun=dryRun)
+
+        if result:
+            result.outLines = 0
+            result.outBytes = 0
+            return result
+
+        runCmd = Command._instantiateSecrets(cmd, secrets, hide=False)
+
+        outCapture = OutputCapture(maxLines)
+        errCapture = OutputCapture(maxLines)
+
+        with subprocess.Popen(runCmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              shell=True) as proc:
+
+            # Read stderr concurrently to avoid blocking the command
+
+            errThread = threading.Thread(target=CmdShell._readLines,
+                                         args=(proc.stderr, errCapture, None), daemon=True)
+            errThread.start()
+
+            CmdShell._readLines(proc.stdout, outCapture, onLine)
+
+            errThread.join()
+            rcode = proc.wait()
+
+        result = Command.buildResult(str(outCapture), str(errCapture), rcode, rcOk)
+        result.outLines = outCapture.numLines
+        result.outBytes = outCapture.numBytes
+
+        return result
+
+    @staticmethod
+    def _readLines(stream, capture, onLine):
+        for rawLine in stream:
+            line = rawLine.decode(errors='replace').rstrip('\n')
+            capture.add(line, len(rawLine))
+            if onLine:
+                onLine(line)
+
+
+class SshSession():
+    """ Persistent SSH session executing commands in a long-lived remote shell
+
+        A single 'ssh' client process runs a remote shell which reads
+        commands from stdin. Each command is sent base64 encoded and
+        executed by the login shell of the remote user. Its stdout is
+        followed by a marker line containing the return code and the
+        base64 encoded stderr of the command (see frameCmd()).
+    """
+
+    _pool     = {}
+    _poolLock = threading.Lock()
+
+    @staticmethod
+    def get(key, sshCmd, secrets):
+        """ Get the pooled session for <key>; start a new session if needed """
+        with SshSession._poolLock:
+            session = SshSession._pool.get(key)
+            if not session or not session.isAlive():
+                session = SshSession(sshCmd, secrets)
+                SshSession._pool[key] = session
+            return session
+
+    @staticmethod
+    def frameCmd(cmd, marker):
+        """ Get shell code which executes <cmd> and frames its results by <marker> """
+        encCmd = base64.b64encode(cmd.encode()).decode()
+        return (f"__c=$(printf %s '{encCmd}' | base64 -d); __e=$(mktemp);"
+                f' "${{SHELL:-sh}}" -c "$__c" </dev/null 2>"$__e"; __rc=$?;'
+                f' echo; echo "{marker} $__rc"; base64 "$__e" | tr -d "\\n";'
+                f' echo; rm -f "$__e"\n')
+
+    @staticmethod
+    def readFramedResult(stream, marker):
+        """ Read the (out, err, rc) of a command framed by <marker> from <stream>;
+            return None if <stream> ends before the result is complete """
+
+        outLines = []
+
+        while True:
+            line = stream.readline()
+            if not line:
+                return None
+
+            line = line.decode(errors='replace').rstrip('\n')
+            if line.startswith(marker):
+                break
+            outLines.append(line)
+
+        rcode = int(line.split()[1])
+        err   = base64.b64decode(stream.readline().strip()).decode(errors='replace')
+
+        return ('\n'.join(outLines).strip(), err.strip(), rcode)
+
+    @staticmethod
+    def closeAll():
+        """ Close all pooled sessions """
+        with SshSession._poolLock:
+            for session in SshSession._pool.values():
+                session.close()
+            SshSession._pool.clear()
+
+    def __init__(self, sshCmd, secrets):
+        self._lock    = threading.Lock()
+        self._marker  = f'__soos_{uuid.uuid4().hex}__'
+        self._started = False
+
+        logging.debug(f"Starting SSH session >>>\n"
+                      f"{Command._instantiateSecrets(sshCmd, secrets, hide=True)}\n<<<")
+
+        # The remote command must be valid for any login shell (e.g. csh)
+
+        runCmd = Command._instantiateSecrets(f"{sshCmd} 'exec sh -s'", secrets, hide=False)
+
+        # pylint: disable=consider-using-with
+        self._proc = subprocess.Popen(runCmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, shell=True)
+
+    def isAlive(self):
+        """ True if the SSH client process of this session is running """
+        return self._proc.poll() is None
+
+    def tryRun(self, cmd):
+        """ Execute a command in this session
+
+            Returns (out, err, rc) or None if the session is busy or not
+            usable; in this case the command was not executed.
+        """
+        results = self.tryRunBatch([cmd])
+        return results[0] if results else None
+
+    def tryRunBatch(self, cmds):
+        """ Execute a list of commands in this session with a single round trip
+
+            Returns a list of (out, err, rc) or None if the session is busy
+            or could not be started; in this case no command was sent and the
+            caller has to execute the commands otherwise. If the session
+            terminates after the commands were sent, the commands without
+            result get rc 255 since they may have been executed partially.
+        """
+
+        if not self._lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            return None
+
+        try:
+            if not self.isAlive() or not self._start():
+                return None
+
+            script = ''.join(SshSession.frameCmd(cmd, self._marker) for cmd in cmds)
+
+            try:
+                self._proc.stdin.write(script.encode())
+                self._proc.stdin.flush()
+            except (BrokenPipeError, OSError):
+                pass
+
+            results = []
+            for _cmd in cmds:
+                result = SshSession.readFramedResult(self._proc.stdout, self._marker)
+                if not result:
+                    self._proc.kill()
+                    result = ('', 'SSH session terminated unexpectedly', 255)
+                results.append(result)
+
+            return results
+
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """ Terminate the remote shell and the SSH client process """
+        if self.isAlive():
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=10)
+            except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+                self._proc.kill()
+
+    def _start(self):
+        """ Check once that the remote shell executes commands (e.g. that the
+            authentication succeeded); return False if the session is not usable """
+
+        if self._started:
+            return True
+
+        try:
+            self._proc.stdin.write(SshSession.frameCmd('true', self._marker).encode())
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return False
+
+        result = SshSession.readFramedResult(self._proc.stdout, self._marker)
+        if not result or result[2] != 0:
+            self._proc.kill()
+            return False
+
+        self._started = True
+        return True
+
+
+atexit.register(SshSession.closeAll)
+
 
 class CmdSsh(Command):
     """ Execute a command on a remote host using SSH """
@@ -204,6 +458,7 @@ class CmdSsh(Command):
         self._sshCmd        = sshCmd
         self._sshLogin      = sshLogin
         self._sshCmdSecrets = sshCmdSecrets
+        self._sessionKey    = (hostname, user.name, sshId)
 
         # Check the connection and create the socket for connection
         # reuse in case the socket does not exist yet
@@ -257,7 +512,19 @@ class CmdSsh(Command):
         return msg
 
     def run(self, cmd, secrets=None, rcOk=(0,), dryRun=False):
-        """ Execute a command on a remote host using SSH """
+        """ Execute a command on a remote host using SSH
+
+            The command is executed in the pooled persistent SSH session
+            for this host and user if possible. Otherwise (session busy or
+            not available, command containing single quotes which are
+            interpreted by the local shell) a new 'ssh' process is forked.
+        """
+
+        if not dryRun and "'" not in cmd:
+            result = self._runInSession(cmd, secrets, rcOk)
+            if result:
+                return result
+
         if secrets:
             cmd = Command._shiftSecrets(cmd, secrets, len(self._sshCmdSecrets))
         else:
@@ -268,6 +535,70 @@ class CmdSsh(Command):
 
         return  self._cmdShell.run(cmd, secrets, rcOk, dryRun)
 
+    def _runInSession(self, cmd, secrets, rcOk):
+        session = SshSession.get(self._sessionKey,
+                                 f'{self._sshCmd} {self._sshLogin}', self._sshCmdSecrets)
+
+        logging.debug(f"Executing command in SSH session '{self._sshLogin}' >>>\n"
+                      f"{Command._instantiateSecrets(cmd, secrets, hide=True)}\n<<<")
+
+        res = session.tryRun(Command._instantiateSecrets(cmd, secrets, hide=False))
+        if not res:
+            logging.debug('SSH session not usable - forking new ssh process')
+            return None
+
+        (out, err, rcode) = res
+        return Command.buildResult(out, err, rcode, rcOk)
+
+    def runBatch(self, cmds, rcOk=(0,)):
+        """ Execute a list of commands on a remote host using SSH with a single round trip
+
+            Returns a list of results (one per command). The commands are executed
+            one after another by the login shell of the remote user in the pooled
+            SSH session or, if the session is not usable, in a newly forked
+            'ssh' process. Different from run() the commands are passed to the
+            remote host verbatim (single quotes are not interpreted locally).
+        """
+
+        for cmd in cmds:
+            logging.debug(f"Executing batched command on '{self._sshLogin}' >>>\n{cmd}\n<<<")
+
+        session = SshSession.get(self._sessionKey,
+                                 f'{self._sshCmd} {self._sshLogin}', self._sshCmdSecrets)
+        results = session.tryRunBatch(cmds)
+
+        if not results:
+            logging.debug('SSH session not usable - forking new ssh process')
+            marker = f'__soos_{uuid.uuid4().hex}__'
+            script = ''.join(SshSession.frameCmd(cmd, marker) for cmd in cmds)
+            runCmd = Command._instantiateSecrets(f"{self._sshCmd} {self._sshLogin} 'exec sh -s'",
+                                                 self._sshCmdSecrets, hide=False)
+            cProc  = subprocess.run(runCmd, input=script.encode(), stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, shell=True, check=False)
+            stream = io.BytesIO(cProc.stdout)
+            results = []
+            for _cmd in cmds:
+                result = SshSession.readFramedResult(stream, marker)
+                if not result:
+                    result = ('', cProc.stderr.decode().strip(), cProc.returncode or 255)
+                results.append(result)
+
+        return [Command.buildResult(out, err, rcode, rcOk) for (out, err, rcode) in results]
+
+    def runStream(self, cmd, onLine=None, secrets=None, rcOk=(0,), dryRun=False, maxLines=100):
+        """ Execute a command on a remote host using SSH processing its output line by line
+            (see CmdShell.runStream()) """
+        # pylint: disable=too-many-arguments
+        if secrets:
+            cmd = Command._shiftSecrets(cmd, secrets, len(self._sshCmdSecrets))
+        else:
+            secrets = []
+
+        cmd     = f"{self._sshCmd} {self._sshLogin} '{cmd}'"
+        secrets = self._sshCmdSecrets + secrets
+
+        return self._cmdShell.runStream(cmd, onLine, secrets, rcOk, dryRun, maxLines)
+
     def getSshCmdAndSecrets(self, withLogin=True):
         """ Get SSH command which is executed by this instance """
 
@@ -284,3 +615,86 @@ class CmdSsh(Command):
             cmd += f"-i {self._sshId} "
         cmd += f"-o PasswordAuthentication=no -o BatchMode=yes {self._sshLogin} 'exit'"
         return self._cmdShell.run(cmd).rc > 0
+
+
+class AsyncCmdShell(Command):
+    """ Execute a local shell command asynchronously (asyncio) """
+
+    def __init__(self):
+        # pylint: disable=useless-super-delegation
+        super().__init__()
+
+    async def run(self, cmd, secrets=None, rcOk=(0,), dryRun=False):  # pylint: disable=invalid-overridden-method
+        """ Execute a local shell command; same semantics as CmdShell.run() """
+
+        result = super().run(cmd, secrets=secrets, rcOk=rcOk, dryRun=dryRun)
+
+        if not result:
+
+            runCmd = Command._instantiateSecrets(cmd, secrets, hide=False)
+
+            proc = await asyncio.create_subprocess_shell(runCmd,
+                                                         stdout=asyncio.subprocess.PIPE,
+                                                         stderr=asyncio.subprocess.PIPE)
+            (out, err) = await proc.communicate()
+
+            result = Command.buildResult(out.decode().strip(), err.decode().strip(),
+                                         proc.returncode, rcOk)
+
+        return result
+
+
+class AsyncCmdSsh(Command):
+    """ Execute a command on a remote host using SSH asynchronously (asyncio)
+
+        Same command and secret handling as CmdSsh. Different from CmdSsh
+        the connection is not checked on construction and each command
+        is executed by a new 'ssh' process.
+    """
+
+    def __init__(self, ctx, hostname, user, sshId=None, reuseCon=True):
+        # pylint: disable=too-many-arguments
+
+        super().__init__()
+
+        self._cmdShell = AsyncCmdShell()
+
+        if not sshId:
+            sshId = ctx.cr.build.user.sshid
+
+        (self._sshCmd,
+         self._sshLogin,
+         self._sshCmdSecrets) = CmdSsh._getSshCmdAndSecrets(hostname, user, sshId, reuseCon)
+
+    async def run(self, cmd, secrets=None, rcOk=(0,), dryRun=False):  # pylint: disable=invalid-overridden-method
+        """ Execute a command on a remote host using SSH; same semantics as CmdSsh.run() """
+        if secrets:
+            cmd = Command._shiftSecrets(cmd, secrets, len(self._sshCmdSecrets))
+        else:
+            secrets = []
+
+        cmd     = f"{self._sshCmd} {self._sshLogin} '{cmd}'"
+        secrets = self._sshCmdSecrets + secrets
+
+        return await self._cmdShell.run(cmd, secrets, rcOk, dryRun)
+
+
+# Functions
+
+def runConcurrently(coroutines, limit=None):
+    """ Run coroutines (e.g. AsyncCmdShell.run() or AsyncCmdSsh.run() calls) concurrently;
+        at most <limit> coroutines run at the same time if <limit> is set.
+        Returns the list of results in the order of <coroutines>. """
+
+    async def gather():
+        semaphore = asyncio.Semaphore(limit) if limit else None
+
+        async def bounded(coroutine):
+            if not semaphore:
+                return await coroutine
+            async with semaphore:
+                return await coroutine
+
+        return await asyncio.gather(*[bounded(coroutine) for coroutine in coroutines])
+
+    return asyncio.run(gather())
@@ -186,9 +186,10 @@ class Config(ConfigBase):
         self._discoverHdb()
         self._discoverOcp()
 
-    def _getInstno(self, cmdSsh, sidU, instPrefix, host):
-        cmd = f'grep -E "SAPSYSTEM +" /usr/sap/{sidU}/SYS/profile/{sidU}_{instPrefix}*_{host}'
-        result = cmdSsh.run(cmd)
+    def _getInstnoCmd(self, sidU, instPrefix, host):
+        return f'grep -E "SAPSYSTEM +" /usr/sap/{sidU}/SYS/profile/{sidU}_{instPrefix}*_{host}'
+
+    def _parseInstno(self, result, sidU, instPrefix, host):
         if result.rc > 0:
             raise _DiscoveryError(
                 f"Could not discover instance number of {sidU} on host {host}\n"
@@ -201,8 +202,8 @@ class Config(ConfigBase):
 
         return result.out.split('\n')[0].split()[2]
 
-    def _getTimeZone(self, cmdSsh):
-        return cmdSsh.run('timedatectl | grep  Time | cut -d ":" -f2 | cut -d " " -f2').out
+    def _getTimeZoneCmd(self):
+        return 'timedatectl | grep  Time | cut -d ":" -f2 | cut -d " " -f2'
 
     def _getHostByName(self, host):
         try:
@@ -250,6 +251,7 @@ class Config(ConfigBase):
         self._config['images']['init'] = {'names': self._getImageNames('init')}
 
     def _discoverNws4(self):
+        # pylint: disable=too-many-locals
 
         # Host and <sid>adm user
 
@@ -289,14 +291,30 @@ class Config(ConfigBase):
                 "can be discovered\n"
             )
 
+        # Run independent discovery commands with a single round trip
+
+        defaultProfile = self._getDefaultProfile(sidU)
+
+        (passwdResult,
+         timeZoneResult,
+         sapfqdnResult,
+         ascsInstnoResult,
+         diInstnoResult) = self._cmdSshNws4.runBatch([
+             f'grep "{user.name}" /etc/passwd',
+             self._getTimeZoneCmd(),
+             f'grep "^SAPFQDN" {defaultProfile}',
+             self._getInstnoCmd(sidU, 'ASCS', host),
+             self._getInstnoCmd(sidU, 'D', host)
+         ])
+
         # User and group ID of <sid>adm
 
-        (uid, gid) = self._cmdSshNws4.run(f'grep "{user.name}" /etc/passwd').out.split(':')[2:4]
+        (uid, gid) = passwdResult.out.split(':')[2:4]
         self._config['refsys']['nws4']['sidadm'] = {'uid': uid, 'gid': gid}
 
         # Time zone
 
-        self._config['refsys']['nws4']['timezone'] = self._getTimeZone(self._cmdSshNws4)
+        self._config['refsys']['nws4']['timezone'] = timeZoneResult.out
 
         # sapmnt base directory
 
@@ -304,10 +322,7 @@ class Config(ConfigBase):
         self._config['refsys']['nws4']['base']['sapmnt'] = self._getSapmntDir(sidU)
 
         # SAPFQDN
-        defaultProfile = self._getDefaultProfile(sidU)
-        result = self._cmdSshNws4.run(
-            f'grep "^SAPFQDN" {defaultProfile}'
-        )
+        result = sapfqdnResult
 
         if result.rc > 0:
             logging.warning("Could not discover SAPFQDN "
@@ -318,8 +333,8 @@ class Config(ConfigBase):
 
         # Instance specific parameters
 
-        ascsInstno = self._getInstno(self._cmdSshNws4, sidU, 'ASCS', host)
-        diInstno   = self._getInstno(self._cmdSshNws4, sidU, 'D', host)
+        ascsInstno = self._parseInstno(ascsInstnoResult, sidU, 'ASCS', host)
+        diInstno   = self._parseInstno(diInstnoResult, sidU, 'D', host)
 
         self._config['refsys']['nws4']['ascs'] = {
             # Instance number
@@ -346,10 +361,10 @@ class Config(ConfigBase):
         self._config['images']['nws4']['packages'] = []
 
     def _discoverHdb(self):
+        # pylint: disable=too-many-locals
         self._config['refsys']['hdb'] = {}
 
-        host = self._discoverHdbHost()
-        sid  = self._discoverHdbSid()
+        (host, sid) = self._discoverHdbHostAndSid()
         sidL = sid.lower()
         sidU = sid.upper()
 
@@ -383,26 +398,36 @@ class Config(ConfigBase):
                 f"{msg}\n\n"
             )
 
-        # User and group ID of <sid>adm
+        # Run independent discovery commands with a single round trip
         # Must be performed on HDB host!
 
-        result = self._cmdSshHdb.run(f'grep "{user.name}" /etc/passwd')
-        if result.rc > 0:
+        (passwdResult,
+         timeZoneResult,
+         instnoResult,
+         baseSharedResult) = self._cmdSshHdb.runBatch([
+             f'grep "{user.name}" /etc/passwd',
+             self._getTimeZoneCmd(),
+             self._getInstnoCmd(sidU, 'HDB', host),
+             self._getHdbBaseSharedCmd(sidU)
+         ])
+
+        # User and group ID of <sid>adm
+
+        if passwdResult.rc > 0:
             raise _DiscoveryError(f"Could not discover uid and gid for user {user.name}.")
-        (uid, gid) = result.out.split(':')[2:4]
+        (uid, gid) = passwdResult.out.split(':')[2:4]
         self._config['refsys']['hdb']['sidadm'] = {'uid': uid, 'gid': gid}
 
         # Time zone
 
-        self._config['refsys']['hdb']['timezone'] = self._getTimeZone(self._cmdSshHdb)
+        self._config['refsys']['hdb']['timezone'] = timeZoneResult.out
 
         # Instance specific parameters
-        # Must be performed on HDB host!
 
         # Instance number
 
-        self._config['refsys']['hdb']['instno'] = self._getInstno(self._cmdSshHdb,
-                                                                  sidU, 'HDB', host)
+        self._config['refsys']['hdb']['instno'] = self._parseInstno(instnoResult,
+                                                                    sidU, 'HDB', host)
 
         # HDB host rename
 
@@ -417,7 +442,9 @@ class Config(ConfigBase):
         # HDB base directories
 
         self._config['refsys']['hdb']['base'] = {}
-        self._config['refsys']['hdb']['base']['shared'] = self._discoverHdbBaseShared(sidU)
+        self._config['refsys']['hdb']['base']['shared'] = self._parseHdbBaseShared(
+            baseSharedResult
+        )
         self._config['refsys']['hdb']['base']['data']   = self._discoverHdbBaseData(sidU)
         self._config['refsys']['hdb']['base']['log']    = self._discoverHdbBaseLog(sidU)
 
@@ -494,25 +521,23 @@ class Config(ConfigBase):
                 res['memory'] = diMinMem
                 logging.warning(getMessage("msgL001", kind, "Dialog Instance", diMinMem))
 
-    def _discoverHdbSid(self):
+    def _discoverHdbHostAndSid(self):
         defaultProfile = self._getDefaultProfile(self._config['refsys']['nws4']['sidU'])
-        cmd = f'grep dbs/hdb/dbname {defaultProfile}'
-        result = self._cmdSshNws4.run(cmd)
-        if result.rc > 0:
+        (hostResult, sidResult) = self._cmdSshNws4.runBatch([
+            f'grep SAPDBHOST {defaultProfile}',
+            f'grep dbs/hdb/dbname {defaultProfile}'
+        ])
+        if hostResult.rc > 0:
+            raise _DiscoveryError(f"Could not discover SAPDBHOST from {defaultProfile}")
+        if sidResult.rc > 0:
             raise _DiscoveryError(f"Could not discover HANA SID from {defaultProfile}")
-        return result.out.split('=')[1].strip()
+        return (hostResult.out.split('=')[1].strip(), sidResult.out.split('=')[1].strip())
 
-    def _discoverHdbHost(self):
-        defaultProfile = self._getDefaultProfile(self._config['refsys']['nws4']['sidU'])
-        cmd = f'grep SAPDBHOST {defaultProfile}'
-        result = self._cmdSshNws4.run(cmd)
-        if result.rc > 0:
-            raise _DiscoveryError(f"Could not discover SAPDBHOST from {defaultProfile}")
-        return result.out.split('=')[1].strip()
+    def _getHdbBaseSharedCmd(self, sidU):
+        return f'readlink /usr/sap/{sidU}/SYS/profile'
 
-    def _discoverHdbBaseShared(self, sidU):
-        profile   = f'/usr/sap/{sidU}/SYS/profile'
-        out       = self._cmdSshHdb.run(f'readlink {profile}').out
+    def _parseHdbBaseShared(self, result):
+        out = result.out
         # example for out:
         # /hana/shared/SID/profile
         # after splitting it:
@@ -617,10 +642,12 @@ class Config(ConfigBase):
             f"/usr/sap/{sidU}/HDB{instno}/{hostname}"
         ]
 
-        for location in locationlist:
-            basepath = f"basepath_{baseType}volumes"
-            cmd = f'grep "{basepath}[= ]" {location}/global.ini'
-            result = self._cmdSshHdb.run(cmd)
+        basepath = f"basepath_{baseType}volumes"
+        results  = self._cmdSshHdb.runBatch([
+            f'grep "{basepath}[= ]" {location}/global.ini' for location in locationlist
+        ])
+
+        for result in results:
             if result.rc == 0:
                 # Example for result.out
                 # basepath_datavolumes = /sapmnt/hana/data/HD1
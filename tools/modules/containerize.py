@@ -19,12 +19,17 @@
 
 # Global modules
 
+import concurrent.futures
+import datetime
+import os
+
 # Local modules
 
 from modules.command  import CmdShell
 from modules.fail     import fail
 from modules.nfstools import Overlays
 from modules.ocp      import Ocp
+from modules.times    import saveTime
 
 # Public methods
 
@@ -38,24 +43,43 @@ def copyHdb(ctx):
     _runCmd(cmd)
 
 
-def buildImages(ctx):
-    """ Build images for all flavors (automation option) """
-    for flavor in ctx.config.getImageFlavors():
-        print(_genHeader1(f"Building image for flavor '{flavor}'"))
-        cmd = f'time {ctx.cf.build.repo.root}/tools/image-build'
-        cmd += f' -f {flavor}'
-        cmd += ctx.ar.commonArgsStr
-        _runCmd(cmd)
+def buildAndPushImages(ctx, build, push):
+    """ Build and / or push images for all flavors (automation option)
+
+        The flavors are processed concurrently; the push of an image
+        starts as soon as its build is finished. The output of each
+        flavor is written to a separate log file and printed when
+        the flavor is finished.
+    """
+
+    # pylint: disable=too-many-locals
+
+    flavors = ctx.config.getImageFlavors()
+    steps   = [step for (step, selected) in (('build', build), ('push', push)) if selected]
+
+    activity = {('build',): 'Building', ('push',): 'Pushing'}.get(
+        tuple(steps), 'Building and pushing')
+    print(_genHeader1(f"{activity} images for flavors {', '.join(flavors)}"))
 
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(flavors)) as pool:
+        futures = {pool.submit(_buildAndPushImage, ctx, flavor, steps): flavor
+                   for flavor in flavors}
+        failed  = []
+        timings = []
+        for future in concurrent.futures.as_completed(futures):
+            (output, errorMsg, flavorTimings) = future.result()
+            print(output)
+            timings += flavorTimings
+            if errorMsg:
+                failed.append(errorMsg)
 
-def pushImages(ctx):
-    """ Push images for all flavors to OCP (automation option) """
-    for flavor in ctx.config.getImageFlavors():
-        print(_genHeader1(f"Pushing image for flavor '{flavor}'"))
-        cmd = f'time {ctx.cf.build.repo.root}/tools/image-push'
-        cmd += f' -f {flavor}'
-        cmd += ctx.ar.commonArgsStr
-        _runCmd(cmd)
+    # The elapsed times are recorded by the main thread in chronological order
+
+    for (label, timeStamp) in sorted(timings, key=lambda timing: timing[1]):
+        saveTime(label, timeStamp)
+
+    if failed:
+        fail('\n'.join(failed))
 
 
 def setupOverlayShare(ctx, overlayUuid=None, out=True):
@@ -156,6 +180,38 @@ def getOverlayUuid(ctx, overlayUuid):
     return Overlays(ctx).find(overlayUuid).uuid
 
 
+def _buildAndPushImage(ctx, flavor, steps):
+    """ Run the given steps ('build', 'push') for one image flavor;
+        returns (<output>, <error message or None>, <list of (label, time stamp)>) """
+    tools   = {'build': 'image-build', 'push': 'image-push'}
+    output  = ''
+    timings = []
+    logFilePath = f'{ctx.ar.logfile_dir}/containerize-image-{flavor}.log'
+    os.makedirs(ctx.ar.logfile_dir, exist_ok=True)
+
+    # pylint: disable=invalid-name, unspecified-encoding
+    with open(logFilePath, 'w') as fh:
+        for step in steps:
+            label = f"{step.capitalize()} Image '{flavor}'"
+            cmd = f'time {ctx.cf.build.repo.root}/tools/{tools[step]}'
+            cmd += f' -f {flavor}'
+            cmd += ctx.ar.commonArgsStr
+            timings.append((f'{label} Start', datetime.datetime.now()))
+            result = CmdShell().run(cmd)
+            timings.append((f'{label} End', datetime.datetime.now()))
+
+            header = _genHeader2(f"{step.capitalize()} of image for flavor '{flavor}'"
+                                 f" (log file '{logFilePath}')")
+            print(f'{header}\n{result.out}\n{result.err}', file=fh, flush=True)
+            output += f'{header}\n{result.err}\n'
+
+            if result.rc != 0:
+                return (output, f"Command '{cmd}' failed with rc {result.rc}"
+                                f" - see log file '{logFilePath}'", timings)
+
+    return (output, None, timings)
+
+
 def _runCmd(cmd):
     result = CmdShell().run(cmd)
     if result.rc != 0:
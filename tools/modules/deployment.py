@@ -19,6 +19,7 @@
 
 # Global modules
 
+import concurrent.futures
 import os
 import time
 import string
@@ -30,6 +31,10 @@ import yaml
 from modules.ocp          import Ocp
 from modules.nestedns     import (objToNestedNs, nestedNsToObj)
 from modules.fail         import fail
+from modules.nfstools     import (
+    Overlay,
+    getValidNfsServerAddress
+)
 
 from modules.tools        import (
     ocpMemoryResourcesValid,
@@ -40,8 +45,6 @@ from modules.tools        import (
 )
 
 from modules.containerize import (
-    createDeploymentFile,
-    setupOverlayShare,
     tearDownOverlayShare,
     startDeployment,
     stopDeployment
@@ -53,6 +56,8 @@ from modules.containerize import (
 class Deploy():
     """ Class for all deployment actions """
 
+    _maxParallelApply = 8
+
     def __init__(self, ctx, deploymentType = None, initDeployments= True):
 
         self._ctx            = ctx
@@ -129,53 +134,43 @@ class Deploy():
         if not ocpMemoryResourcesValid(self._ctx):
             fail("Fatal error. Stopping the deployment.")
 
-        parms = getParmsForDeploymentYamlFile(self._ctx, deployment)
-
-        templatePath = f'{self._ctx.cf.build.repo.root}/openshift/'
-        serviceTemplate = f'{templatePath}/service-nodeport.yaml.template'
-        deploymentTemplate = f'{templatePath}/deployment.yaml.template'
-
-        serviceYamlPart    = instantiateYamlTemplate(serviceTemplate, parms)
-        deploymentYamlPart = instantiateYamlTemplate(deploymentTemplate, parms)
+        self._writeYaml(deployment)
 
-        if refSystemIsStandard(self._ctx):
-            # If the reference system is a standard system no OCP secret definition
-            # for the HDB connect user is required
-            # ->
-            # Remove all OCP secret definition related environment variables
-            # to avoid problems at deployment time in case no OCP secret was defined
+        print(deployment.file)
 
-            delEnvVars = ('SOOS_DI_DBUSER', 'SOOS_DI_DBUSERPWD')
-            initContSpec = deploymentYamlPart['spec']['template']['spec']['initContainers'][0]
-            initContSpec['env'] = [e for e in initContSpec['env'] if e['name'] not in delEnvVars]
-
-            # Write deployment file
+    def add(self, number):
+        """ generate new deployment(s)
 
-        try:
-            # pylint: disable=unspecified-encoding
-            with open(deployment.file, 'w') as oFh:
-                print(yaml.dump(serviceYamlPart), file=oFh, end='')
-                print('---', file=oFh)
-                print(yaml.dump(deploymentYamlPart), file=oFh, end='')
+            The overlay shares of all deployments are created in one batch on the
+            NFS server, the deployment description files are generated in-process
+            and the deployments are started concurrently.
+        """
 
-            print(deployment.file)
+        if not ocpMemoryResourcesValid(self._ctx):
+            fail("Fatal error. Stopping the deployment.")
 
-        except IOError:
-            fail(f"Error writing to file {deployment.file}")
+        deployments = [Deployment(self._ctx).get() for _ in range(number)]
 
-    def add(self, number):
-        """ generate new deployment(s) """
-        # pylint: disable=unused-variable
-        for i in range(number):
-            deployment = Deployment(self._ctx).get()
+        for deployment in deployments:
             print(f"Generating deployment with uuid '{deployment.uuid}:'")
             print(f"- Application Name: '{deployment.appName}'")
             print(f"- Overlay Uuid    : '{deployment.overlayUuid}'")
             print(f"- Deployment File : '{deployment.file}'\n")
-            overlayUuid = deployment.overlayUuid
-            setupOverlayShare(self._ctx, overlayUuid=overlayUuid, out=False)
-            createDeploymentFile(self._ctx, overlayUuid, out=False)
-            startDeployment(self._ctx, deployment.file, out=False)
+
+        Overlay.createMany(self._ctx, [deployment.overlayUuid for deployment in deployments],
+                           [deployment.appName for deployment in deployments])
+
+        nfsAddress = getValidNfsServerAddress(self._ctx)
+        for deployment in deployments:
+            self._writeYaml(deployment, nfsAddress)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._maxParallelApply) as pool:
+            results = pool.map(lambda deployment: self._ocp.ocApply(deployment.file), deployments)
+            failed  = [deployment.file for (deployment, result) in zip(deployments, results)
+                       if result.rc != 0]
+
+        if failed:
+            fail(f"Error applying deployment file(s) {', '.join(failed)}")
 
     def remove(self):
         """ Remove all deployment related objects """
@@ -224,6 +219,41 @@ class Deploy():
 
     # Private functions
 
+    def _writeYaml(self, deployment, nfsAddress=None):
+        # Write the deployment description file of a deployment
+
+        parms = getParmsForDeploymentYamlFile(self._ctx, deployment, nfsAddress)
+
+        templatePath = f'{self._ctx.cf.build.repo.root}/openshift/'
+        serviceTemplate = f'{templatePath}/service-nodeport.yaml.template'
+        deploymentTemplate = f'{templatePath}/deployment.yaml.template'
+
+        serviceYamlPart    = instantiateYamlTemplate(serviceTemplate, parms)
+        deploymentYamlPart = instantiateYamlTemplate(deploymentTemplate, parms)
+
+        if refSystemIsStandard(self._ctx):
+            # If the reference system is a standard system no OCP secret definition
+            # for the HDB connect user is required
+            # ->
+            # Remove all OCP secret definition related environment variables
+            # to avoid problems at deployment time in case no OCP secret was defined
+
+            delEnvVars = ('SOOS_DI_DBUSER', 'SOOS_DI_DBUSERPWD')
+            initContSpec = deploymentYamlPart['spec']['template']['spec']['initContainers'][0]
+            initContSpec['env'] = [e for e in initContSpec['env'] if e['name'] not in delEnvVars]
+
+            # Write deployment file
+
+        try:
+            # pylint: disable=unspecified-encoding
+            with open(deployment.file, 'w') as oFh:
+                print(yaml.dump(serviceYamlPart), file=oFh, end='')
+                print('---', file=oFh)
+                print(yaml.dump(deploymentYamlPart), file=oFh, end='')
+
+        except IOError:
+            fail(f"Error writing to file {deployment.file}")
+
     def _waitForStopped(self, appName):
         self._ocp.setAppName(appName)
         while True:
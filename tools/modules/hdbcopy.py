@@ -0,0 +1,986 @@
+# ------------------------------------------------------------------------
+# Copyright 2022 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------
+
+""" Copy an SAP HANA DB snapshot to the NFS server """
+
+
+# Global modules
+
+import concurrent.futures
+import contextlib
+import datetime
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+
+# Local modules
+
+from modules.command  import (
+    CmdShell,
+    CmdSsh
+)
+from modules.fail     import fail
+from modules.nfstools import (
+    NfsConfigUpdate,
+    getHdbCopyBase,
+    getHdbCopyVersionsBase,
+    getHdbSubDirs
+)
+from modules.quantity import Quantity
+
+
+# Constants
+
+# Compression codecs for the HDB copy pipe:
+# (compress command, decompress command, default level, max level)
+
+_codecs = {
+    'zstd': ('zstd -{level} -T0 -q -c', 'zstd -d -q -c', 3, 19),
+    'lz4':  ('lz4 -{level} -q -c',      'lz4 -d -q -c',  1, 12),
+}
+
+
+# Classes
+
+class HdbCopy():
+    """ Copy the data and log volumes of an SAP HANA DB to the NFS server
+
+        The files of each volume tree are distributed across <streams>
+        buckets of roughly equal size (one bucket by default). The files of
+        a bucket are copied in chunks of at most 1 GiB or 1000 files, each
+        by a tar pipe SAPDBHOST -> build host -> NFS server. The buckets of
+        a volume tree are copied concurrently.
+
+        Optionally the data is compressed on SAPDBHOST and decompressed
+        on the NFS server and the sending side of each pipe is
+        rate limited by means of 'pv'. The rate limit applies to all
+        streams together.
+
+        In direct mode the build host only orchestrates the copy:
+        the tar pipe is started on SAPDBHOST with SSH agent forwarding
+        and sends the data by means of a second SSH connection
+        directly to the NFS server.
+
+        In incremental mode each volume tree is synchronized by means of
+        'rsync' started on SAPDBHOST (as in direct mode) into a new snapshot
+        version on the NFS server. Files which did not change since the
+        previous version are hard linked, for changed files only the
+        changed blocks are transferred. Once the new version is complete
+        the HDB copy base is switched to it. Existing overlays keep
+        using the version which was current when they were created.
+
+        Completed volume trees and chunks of files are recorded in a journal
+        on the NFS server. With resume a rerun after an interrupted copy skips
+        completed volume trees and files which are either recorded in the
+        journal or exist in the target with the same size and either the same
+        mtime or the same SHA-256 checksum. Without resume incomplete snapshot
+        versions of previous runs are removed.
+
+        While a volume tree is copied its progress is reported periodically
+        (see class HdbCopyProgress).
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    _chunkBytes = 1024**3
+    _chunkFiles = 1000
+
+    def __init__(self, ctx):
+        self._ctx     = ctx
+        self._sidU    = ctx.cf.refsys.hdb.sidU
+        self._streams = ctx.ar.streams
+
+        self._cmdSshDb  = CmdSsh(ctx, ctx.cf.refsys.hdb.host.name, ctx.cr.refsys.hdb.sidadm)
+        self._cmdSshNfs = CmdSsh(ctx, ctx.cf.nfs.host.name, ctx.cr.nfs.user)
+
+        if ctx.ar.direct or ctx.ar.incremental:
+            self._checkDirect()
+
+        self._copyBase     = getHdbCopyBase(ctx)
+        self._versionsBase = getHdbCopyVersionsBase(ctx)
+        self._versioned    = ctx.ar.incremental or self._isVersioned()
+        self._journal      = HdbCopyJournal(self._cmdSshNfs, f'{self._copyBase}.journal',
+                                            ctx.ar.resume)
+
+        if ctx.ar.verify != 'size':
+            self._checkExecutable(self._cmdSshDb, 'python3', ctx.cf.refsys.hdb.host.name)
+            self._checkExecutable(self._cmdSshNfs, 'python3', ctx.cf.nfs.host.name)
+
+        self._sendFilter, self._receiveFilter = self._getFilters()
+
+    # Public methods
+
+    def copy(self):
+        """ Copy all HDB subdirectories; return True if all copies were verified successfully
+
+            If the progress reports are written as JSON to stdout,
+            all other output is written to stderr.
+        """
+
+        if self._ctx.ar.progress_json != '-':
+            return self._copy(None)
+
+        jsonStream = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            return self._copy(jsonStream)
+
+    # Private methods
+
+    def _copy(self, jsonStream):
+        """ Copy all HDB subdirectories """
+
+        success    = True
+        totalBytes = 0
+        startTime  = time.monotonic()
+
+        if self._versioned:
+            (targetBase, previousBase) = self._beginVersion(self._journal.version)
+            self._journal.addVersion(targetBase)
+        else:
+            (targetBase, previousBase) = (self._copyBase, None)
+
+        for obj in getHdbSubDirs(self._ctx):
+
+            sourceDir = f'{obj.base}/{obj.path}/{self._sidU}'
+            targetDir = f'{targetBase}/{obj.path}/{self._sidU}'
+
+            if sourceDir in self._journal.volumes:
+                print(f"Skipping '{sourceDir}' which was already copied")
+                continue
+
+            self._cmdSshNfs.run(f'mkdir -p "{targetDir}"')
+
+            print(f"Copying '{sourceDir}' to '{targetDir}'"
+                  f" on host '{self._ctx.cf.nfs.host.name}'")
+
+            stepStartTime = time.monotonic()
+
+            previousDir = f'{previousBase}/{obj.path}/{self._sidU}' if previousBase else None
+
+            with self._getProgress(sourceDir, targetDir, jsonStream) as progress:
+                stepBytes = self._copyVolume(sourceDir, targetDir, previousDir, progress)
+
+            self._printThroughput(f"'{sourceDir}'", stepBytes, time.monotonic()-stepStartTime)
+            totalBytes += stepBytes
+
+            if not self._checkCopyStep(sourceDir, targetDir):
+                print(f"Copying '{sourceDir}' to '{targetDir}' was not successful.")
+                success = False
+            else:
+                self._journal.addVolume(sourceDir)
+
+        self._printThroughput('all volumes', totalBytes, time.monotonic()-startTime)
+
+        if self._versioned:
+            if success:
+                self._commitVersion(targetBase)
+            else:
+                print(f"Keeping incomplete snapshot version '{targetBase}';"
+                      f" '{self._copyBase}' was not changed.")
+
+        if success:
+            self._journal.remove()
+        else:
+            print("Rerun with option '--resume' to continue the copy.")
+
+        return success
+
+    def _getProgress(self, sourceDir, targetDir, jsonStream):
+        """ Get the progress reporter for copying a volume tree """
+
+        interval = self._ctx.ar.progress_interval
+
+        if interval > 0:
+            total = getTreeStats(self._cmdSshDb, sourceDir)
+        else:
+            total = types.SimpleNamespace(bytes=0, files=0)
+
+        return HdbCopyProgress(sourceDir, targetDir, total, interval,
+                               self._ctx.ar.progress_json, jsonStream)
+
+    def _copyVolume(self, sourceDir, targetDir, previousDir, progress):
+        """ Copy a volume tree using the selected copy method; return number of bytes copied """
+
+        if self._ctx.ar.incremental:
+            return self._copyIncremental(sourceDir, targetDir, previousDir, progress)
+
+        return self._copyMultiStream(sourceDir, targetDir, progress)
+
+    def _copyMultiStream(self, sourceDir, targetDir, progress):
+        """ Copy a directory tree by means of <streams> concurrent tar pipes """
+
+        # Replicate the directory structure first to get the
+        # ownership and permissions of all directories right
+
+        dirs  = self._getDirList(sourceDir)
+        files = self._getFileList(self._cmdSshDb, sourceDir)
+
+        if self._ctx.ar.resume:
+            pending = self._getPendingFiles(sourceDir, targetDir, files)
+            progress.addSkipped(sum(file[0] for file in files) - sum(file[0] for file in pending),
+                                len(files) - len(pending))
+            files = pending
+
+        buckets = self._getBuckets(files)
+
+        with tempfile.TemporaryDirectory() as tmpDir:
+
+            self._runListCopy(sourceDir, targetDir, dirs, f'{tmpDir}/dirs')
+
+            logging.info(f"Copying '{sourceDir}' using {len(buckets)} stream(s)")
+
+            maxWorkers = max(1, len(buckets))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+                futures = [
+                    executor.submit(self._copyBucket, sourceDir, targetDir,
+                                    bucket, f'{tmpDir}/bucket-{i}', progress)
+                    for (i, bucket) in enumerate(buckets)
+                ]
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+
+        return sum(bucket.size for bucket in buckets)
+
+    def _copyBucket(self, sourceDir, targetDir, bucket, listFile, progress):
+        """ Copy the files of a bucket chunk by chunk and record each completely
+            copied chunk in the journal; return True on success """
+
+        # pylint: disable=too-many-arguments
+
+        for chunk in self._getChunks(bucket.files):
+            counter = progress.getPipeCounter(sum(size for (size, _mtime, _path) in chunk))
+            if not self._runListCopy(sourceDir, targetDir,
+                                     [path for (_size, _mtime, path) in chunk], listFile, counter):
+                return False
+            counter(sum(size for (size, _mtime, _path) in chunk))
+            progress.addFiles(len(chunk))
+            self._journal.addFiles(sourceDir, chunk)
+
+        return True
+
+    def _getPendingFiles(self, sourceDir, targetDir, files):
+        """ Get the files which were not copied completely by a previous run """
+
+        targetFiles = {
+            path: (size, mtime)
+            for (size, mtime, path) in self._getFileList(self._cmdSshNfs, targetDir)
+        }
+
+        pending    = []
+        candidates = []  # files with the same size but a different mtime in the target
+        for (size, mtime, path) in files:
+            if self._journal.files.get(f'{sourceDir}/{path}') == (size, mtime):
+                continue
+            if targetFiles.get(path) == (size, mtime):
+                continue
+            if path in targetFiles and targetFiles[path][0] == size:
+                candidates.append((size, mtime, path))
+            else:
+                pending.append((size, mtime, path))
+
+        if candidates:
+            matching = self._getMatchingChecksums(sourceDir, targetDir,
+                                                  [path for (_size, _mtime, path) in candidates])
+            pending += [file for file in candidates if file[2] not in matching]
+
+        print(f"Resuming '{sourceDir}': {len(files)-len(pending)} of {len(files)}"
+              f" file(s) already copied")
+
+        return pending
+
+    def _getMatchingChecksums(self, sourceDir, targetDir, paths):
+        """ Get the set of paths whose SHA-256 checksums are the same in the
+            source and in the target directory tree """
+
+        with tempfile.TemporaryDirectory() as tmpDir:
+            listFile = f'{tmpDir}/paths'
+            # pylint: disable=unspecified-encoding
+            with open(listFile, 'w') as lfh:
+                lfh.write(''.join(f'{path}\n' for path in paths))
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                sourceSums = executor.submit(self._getChecksums, self._cmdSshDb,
+                                             sourceDir, listFile)
+                targetSums = executor.submit(self._getChecksums, self._cmdSshNfs,
+                                             targetDir, listFile)
+                (sourceSums, targetSums) = (sourceSums.result(), targetSums.result())
+
+        return {path for (path, checksum) in sourceSums.items() if targetSums.get(path) == checksum}
+
+    def _getChecksums(self, cmdSsh, directory, listFile):
+        """ Get {<path>: <SHA-256 checksum>} of the files listed in listFile
+            relative to directory on a remote host """
+
+        checksums = {}
+
+        def addChecksum(line):
+            (checksum, _sep, path) = line.partition('  ')
+            if path:
+                checksums[path] = checksum
+
+        sshCmd = cmdSsh.getSshCmdAndSecrets()[0]
+        CmdShell().runStream(f'{sshCmd} "cd {directory} && xargs -d \'\\n\' -r sha256sum --"'
+                             f' < {listFile}', addChecksum, rcOk=(0, 123))
+
+        return checksums
+
+    def _copyIncremental(self, sourceDir, targetDir, previousDir, progress):
+        """ Synchronize a directory tree by means of rsync started on SAPDBHOST """
+
+        # List all files including the unchanged ones ('-ii') for the progress report
+        rsyncOpts  = '-a --no-whole-file --numeric-ids --delete --stats'
+        rsyncOpts += ' -ii --out-format=\'%i %l\''
+        rsyncOpts += ' -e \'ssh -o StrictHostKeyChecking=no -o BatchMode=yes\''
+
+        if previousDir:
+            # Unchanged files are hard linked, changed files use the previous
+            # version as basis for the delta transfer
+            rsyncOpts += f' --link-dest={previousDir}'
+
+        if self._ctx.ar.compress != 'none':
+            rsyncOpts += ' -z'
+
+        if self._ctx.ar.rate_limit:
+            rateLimit = Quantity(self._ctx.ar.rate_limit).valueIntNormalized()
+            rsyncOpts += f' --bwlimit={max(1, rateLimit // 1024)}'
+
+        nfsLogin = f'{self._ctx.cr.nfs.user.name}@{self._ctx.cf.nfs.host.name}'
+
+        bytesSent = [0]
+
+        def parseStats(line):
+            match = re.match(r'\S?f\S*\s+(\d+)$', line)
+            if match:
+                progress.addBytes(int(match.group(1)))
+                progress.addFiles(1)
+            match = re.match(r'Total bytes sent: ([\d,.]+)', line)
+            if match:
+                bytesSent[0] = int(re.sub(r'[,.]', '', match.group(1)))
+
+        res = CmdShell().runStream(f'{self._getSshDbForwardAgent()}'
+                                   f' "rsync {rsyncOpts} {sourceDir}/ {nfsLogin}:{targetDir}/"',
+                                   parseStats)
+        if res.rc != 0:
+            logging.error(f"rsync for '{sourceDir}' returned rc {res.rc}")
+
+        return bytesSent[0]
+
+    def _isVersioned(self):
+        """ True if the HDB copy base is a link to a snapshot version """
+        return self._cmdSshNfs.run(f'test -L "{self._copyBase}"', rcOk=(0, 1)).rc == 0
+
+    def _beginVersion(self, resumeVersion):
+        """ Create a new snapshot version or continue the version <resumeVersion>
+            of an interrupted copy; return (new version, previous version) """
+
+        cmdSsh = self._cmdSshNfs
+
+        if resumeVersion and cmdSsh.run(f'test -d "{resumeVersion}"', rcOk=(0, 1)).rc == 0:
+            previous = cmdSsh.run(f'readlink -e "{self._copyBase}"', rcOk=(0, 1)).out or None
+            logging.info(f"Continuing snapshot version '{resumeVersion}'"
+                         f" (previous: '{previous}')")
+            return (resumeVersion, previous)
+
+        # Convert a snapshot copied by a previous non-versioned copy
+        # into the initial snapshot version; the lower directories of
+        # existing overlays are pinned to it in /etc/fstab, otherwise they
+        # would follow the link to the new version after the next mount
+
+        if cmdSsh.run(f'test -d "{self._copyBase}" -a ! -L "{self._copyBase}"',
+                      rcOk=(0, 1)).rc == 0:
+            initial = f'{self._versionsBase}/initial'
+            logging.info(f"Moving existing snapshot '{self._copyBase}' to '{initial}'")
+            nfsUpdate = NfsConfigUpdate()
+            nfsUpdate.substituteFstab(f'lowerdir={self._copyBase}/', f'lowerdir={initial}/')
+            convertCmd = ' && '.join([f'mkdir -p "{self._versionsBase}"',
+                                      f'mv -T "{self._copyBase}" "{initial}"',
+                                      f'ln -s "{initial}" "{self._copyBase}"']
+                                     + nfsUpdate.getCmds())
+            if cmdSsh.runBatch([convertCmd])[0].rc != 0:
+                fail(f"Error: could not convert '{self._copyBase}' to snapshot version '{initial}'")
+
+        previous = cmdSsh.run(f'readlink -e "{self._copyBase}"', rcOk=(0, 1)).out or None
+
+        if not self._ctx.ar.resume:
+            # Remove incomplete versions of interrupted copies which are not resumed
+            cmdSsh.run(f'find "{self._versionsBase}" -mindepth 1 -maxdepth 1'
+                       f' -name "*.partial" -exec rm -rf {{}} +', rcOk=(0, 1))
+
+        stamp   = time.strftime('%Y%m%d-%H%M%S')
+        version = f'{self._versionsBase}/{stamp}.partial'
+        cmdSsh.run(f'mkdir -p "{version}"')
+
+        logging.info(f"Creating snapshot version '{version}' (previous: '{previous}')")
+
+        return (version, previous)
+
+    def _commitVersion(self, version):
+        """ Complete a snapshot version and make it the current one """
+
+        cmdSsh = self._cmdSshNfs
+
+        final = version[:-len('.partial')]
+        res = cmdSsh.run(f'mv -T "{version}" "{final}"'
+                         f' && ln -sfn "{final}" "{self._copyBase}.new"'
+                         f' && mv -T "{self._copyBase}.new" "{self._copyBase}"')
+        if res.rc != 0:
+            fail(f"Error: could not switch '{self._copyBase}' to '{final}'")
+
+        print(f"Snapshot version '{final}' is now current")
+
+        if self._ctx.ar.keep_versions > 0:
+            self._pruneVersions(final)
+
+    def _pruneVersions(self, current):
+        """ Remove old snapshot versions which are not used by any overlay """
+
+        cmdSsh = self._cmdSshNfs
+
+        versions = cmdSsh.run(f'ls -1d "{self._versionsBase}"/*', rcOk=(0, 2)).out.split('\n')
+
+        for version in getPrunableVersions(versions, current, self._ctx.ar.keep_versions):
+            if cmdSsh.run(f'grep -q "lowerdir={version}/" /etc/fstab', rcOk=(0, 1)).rc == 0:
+                logging.info(f"Keeping snapshot version '{version}' which is used by an overlay")
+                continue
+            print(f"Removing snapshot version '{version}'")
+            cmdSsh.run(f'rm -rf "{version}"')
+
+    def _runListCopy(self, sourceDir, targetDir, paths, listFile, onBytes=None):
+        """ Copy a list of paths relative to sourceDir by means of a tar pipe;
+            return True on success
+
+            If onBytes is set, it is passed the number of bytes sent so far
+            about every 10 MiB; the sending tar reports checkpoints of 1000
+            records of 10240 bytes on stderr which is read from the pipe.
+        """
+
+        # pylint: disable=too-many-arguments,unspecified-encoding
+        with open(listFile, 'w') as lfh:
+            lfh.write(''.join(f'{path}\n' for path in paths))
+
+        tarCmd   = f'tar cf - -C {sourceDir} --no-recursion -T -'
+        untarCmd = f'tar xf - -C {targetDir} --same-owner'
+
+        if not onBytes:
+            res = CmdShell().run(self._getPipeCmd(tarCmd, untarCmd, listFile))
+        else:
+            def onLine(line):
+                match = re.match(r'tar: (\d+)$', line)
+                if match:
+                    onBytes(int(match.group(1)) * 10240)
+
+            tarCmd += ' --checkpoint=1000 --checkpoint-action=echo=%u'
+            pipeCmd = self._getPipeCmd(tarCmd, untarCmd, listFile)
+            res = CmdShell().runStream(f'{{ {pipeCmd}; }} 2>&1', onLine)
+
+        if res.rc != 0:
+            logging.error(f"Copy pipe for list '{listFile}' returned rc {res.rc}")
+
+        return res.rc == 0
+
+    def _getPipeCmd(self, tarCmd, untarCmd, listFile=None):
+        """ Get the pipe SAPDBHOST -> build host -> NFS server for given tar commands """
+
+        # ssh command Build Server -> SAPDBHOST
+        sshDb  = self._cmdSshDb.getSshCmdAndSecrets()[0]
+        # ssh command Build Server -> NFS Server
+        sshNfs = self._cmdSshNfs.getSshCmdAndSecrets()[0]
+
+        stdin = f' < {listFile}' if listFile else ''
+
+        if self._ctx.ar.direct:
+            return (f'{self._getSshDbForwardAgent()}'
+                    f' "{tarCmd}{self._sendFilter}'
+                    f' | {self._getSshDbToNfs()} \'{self._receiveFilter}{untarCmd}\'"{stdin}')
+
+        return (f'{sshDb} "{tarCmd}{self._sendFilter}"{stdin}'
+                f' | {sshNfs} "{self._receiveFilter}{untarCmd}"')
+
+    def _getSshDbForwardAgent(self):
+        """ Get ssh command Build Server -> SAPDBHOST with SSH agent forwarding """
+        sshCmd = self._cmdSshDb.getSshCmdAndSecrets(withLogin=False)[0]
+        sshLogin = f'{self._ctx.cr.refsys.hdb.sidadm.name}@{self._ctx.cf.refsys.hdb.host.name}'
+        return f'{sshCmd} -o ForwardAgent=yes {sshLogin}'
+
+    def _getSshDbToNfs(self):
+        """ Get ssh command SAPDBHOST -> NFS Server """
+        sshLogin = f'{self._ctx.cr.nfs.user.name}@{self._ctx.cf.nfs.host.name}'
+        return f'ssh -o StrictHostKeyChecking=no -o BatchMode=yes {sshLogin}'
+
+    def _checkDirect(self):
+        """ Check prerequisites of the direct transfer SAPDBHOST -> NFS server """
+
+        dbHost  = self._ctx.cf.refsys.hdb.host.name
+        nfsHost = self._ctx.cf.nfs.host.name
+
+        if not os.environ.get('SSH_AUTH_SOCK'):
+            fail("Error: direct copy requires an SSH agent on the build host.\n"
+                 "Rerun this command in an ssh-agent session"
+                 " with the key for the NFS server loaded.")
+
+        if self._ctx.cr.nfs.user.password:
+            fail(f"Error: direct copy does not support password authentication"
+                 f" for user '{self._ctx.cr.nfs.user.name}' on host '{nfsHost}'.")
+
+        logging.debug(f"Checking SSH connection '{dbHost}' -> '{nfsHost}'")
+
+        res = CmdShell().run(f'{self._getSshDbForwardAgent()} "{self._getSshDbToNfs()} true"')
+        if res.rc != 0:
+            fail(f"Error: could not connect from host '{dbHost}' to host '{nfsHost}'"
+                 f" using SSH agent forwarding:\n{res.err}")
+
+    def _getFilters(self):
+        """ Get the compression and rate limit filters for the sending and receiving side """
+
+        sendFilter    = ''
+        receiveFilter = ''
+
+        codec = self._ctx.ar.compress
+        if codec != 'none':
+            (compressCmd, decompressCmd, defaultLevel, maxLevel) = _codecs[codec]
+            level = self._ctx.ar.compress_level or defaultLevel
+            if not 1 <= level <= maxLevel:
+                fail(f"Compression level for '{codec}' must be between 1 and {maxLevel}")
+            self._checkExecutable(self._cmdSshDb, codec, self._ctx.cf.refsys.hdb.host.name)
+            self._checkExecutable(self._cmdSshNfs, codec, self._ctx.cf.nfs.host.name)
+            sendFilter    += f' | {compressCmd.format(level=level)}'
+            receiveFilter += f'{decompressCmd} | '
+            logging.info(f"Compressing copy stream(s) using '{codec}' level {level}")
+
+        if self._ctx.ar.rate_limit:
+            rateLimit = Quantity(self._ctx.ar.rate_limit).valueIntNormalized()
+            self._checkExecutable(self._cmdSshDb, 'pv', self._ctx.cf.refsys.hdb.host.name)
+            # The rate limit applies to all concurrent streams together
+            sendFilter += f' | pv -q -L {max(1, rateLimit // self._streams)}'
+            logging.info(f"Limiting copy rate to {rateLimit} bytes/s")
+
+        return (sendFilter, receiveFilter)
+
+    def _checkExecutable(self, cmdSsh, executable, hostname):
+        if cmdSsh.run(f'command -v {executable}').rc != 0:
+            fail(f"Error: executable '{executable}' not found on host '{hostname}'")
+
+    def _getDirList(self, sourceDir):
+        """ Get paths of all subdirectories of sourceDir relative to sourceDir """
+        dirs = []
+        result = self._cmdSshDb.runStream(
+            f'cd {sourceDir} && find . -mindepth 1 -type d -printf "%P\\n"',
+            lambda line: dirs.append(line) if line else None
+        )
+        if result.rc != 0:
+            fail(f"Error: could not get directory list of '{sourceDir}'")
+        return dirs
+
+    def _getFileList(self, cmdSsh, directory):
+        """ Get (size, mtime, path) of all non-directory entries of directory
+            relative to directory """
+        files = []
+
+        def addFile(line):
+            if line:
+                (size, mtime, path) = line.split(' ', 2)
+                files.append((int(size), int(float(mtime)), path))
+
+        result = cmdSsh.runStream(f'cd {directory} && find . ! -type d -printf "%s %T@ %P\\n"',
+                                  addFile)
+        if result.rc != 0:
+            fail(f"Error: could not get file list of '{directory}'")
+
+        return files
+
+    def _getBuckets(self, files):
+        """ Distribute files across <streams> buckets of roughly equal total size """
+
+        # Greedy: assign the largest remaining file to the currently smallest bucket
+
+        buckets = [types.SimpleNamespace(size=0, files=[]) for _ in range(self._streams)]
+
+        for file in sorted(files, reverse=True):
+            bucket = min(buckets, key=lambda b: b.size)
+            bucket.size += file[0]
+            bucket.files.append(file)
+
+        for (i, bucket) in enumerate(buckets):
+            logging.debug(f"Bucket {i}: {len(bucket.files)} file(s), {bucket.size} byte(s)")
+
+        return [bucket for bucket in buckets if bucket.files]
+
+    def _getChunks(self, files):
+        """ Split a list of files into consecutive chunks of at most
+            <_chunkBytes> bytes (or a single larger file) or <_chunkFiles> files """
+
+        chunks = []
+        (chunk, chunkSize) = ([], 0)
+
+        for file in files:
+            if chunk and (chunkSize + file[0] > self._chunkBytes
+                          or len(chunk) >= self._chunkFiles):
+                chunks.append(chunk)
+                (chunk, chunkSize) = ([], 0)
+            chunk.append(file)
+            chunkSize += file[0]
+
+        if chunk:
+            chunks.append(chunk)
+
+        return chunks
+
+    def _printThroughput(self, label, numBytes, seconds):
+        seconds = max(seconds, 0.001)
+        print(f"Copied {numBytes/1024**3:.2f} GiB of {label}"
+              f" in {seconds:.0f} s"
+              f" ({numBytes/1024**2/seconds:.1f} MiB/s, {self._streams} stream(s))")
+
+    def _getFileSizeSet(self, cmdSsh, directory):
+        cmd = f'cd {directory}; find . -type f -printf "%s %p$"'
+        result = cmdSsh.run(cmd)
+        if result.rc != 0:
+            fail("Error: could not get file list")
+
+        sizeList = result.out.split("$")
+        sizeSet = set()
+        for element in sizeList:
+            sizeSet.add(tuple(element.split(" ")))
+        return sizeSet
+
+    def _checkCopyStep(self, sourceDir, targetDir):
+        if self._ctx.ar.verify != 'size':
+            return self._verifyManifest(sourceDir, targetDir)
+
+        sourceSizes = self._getFileSizeSet(self._cmdSshDb, sourceDir)
+        targetSizes = self._getFileSizeSet(self._cmdSshNfs, targetDir)
+
+        # get differences:
+        diffs = sourceSizes - targetSizes
+
+        # if the set of diffs is not empty, there is a mismatch between source and target
+        if len(diffs) > 0:
+            for obj in diffs:
+                # obj looks like: [<size>, <filename>]
+                print(f"Missing file or file with wrong size: {obj[1]} on {targetDir}")
+            return False
+        return True
+
+    def _verifyManifest(self, sourceDir, targetDir):
+        """ Verify a copy by comparing the checksum manifests of source and target
+
+            The manifests are computed concurrently on SAPDBHOST and on the NFS
+            server and compared line by line while they are streamed in.
+            The manifest of the target is kept in file '<targetDir>.manifest'
+            if it was computed completely.
+        """
+
+        script = f'{self._ctx.cf.build.repo.root}/tools/modules/hdb-manifest'
+
+        if self._ctx.ar.verify == 'full':
+            threshold = 0
+        else:
+            threshold = Quantity(self._ctx.ar.sample_threshold).valueIntNormalized()
+
+        sshDb  = self._cmdSshDb.getSshCmdAndSecrets()[0]
+        sshNfs = self._cmdSshNfs.getSshCmdAndSecrets()[0]
+
+        dbCmd  = f'{sshDb} "python3 - {sourceDir} {threshold}" < {script}'
+        nfsCmd = f'{sshNfs} "python3 - {targetDir} {threshold} {targetDir}.manifest" < {script}'
+
+        logging.info(f"Verifying '{targetDir}' (mode '{self._ctx.ar.verify}')")
+
+        # pylint: disable=consider-using-with
+        dbProc  = subprocess.Popen(dbCmd, shell=True, text=True,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        nfsProc = subprocess.Popen(nfsCmd, shell=True, text=True,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        with dbProc, nfsProc:
+            success = self._compareManifests(dbProc.stdout, nfsProc.stdout, targetDir)
+
+        if dbProc.returncode != 0 or nfsProc.returncode != 0:
+            logging.error(f"Manifest computation returned rc {dbProc.returncode} (source),"
+                          f" {nfsProc.returncode} (target)")
+            success = False
+
+        return success
+
+    def _compareManifests(self, sourceLines, targetLines, targetDir):
+        """ Merge-join two manifests sorted by path """
+
+        source = self._parseManifest(sourceLines)
+        target = self._parseManifest(targetLines)
+
+        success = True
+
+        src = next(source, None)
+        tgt = next(target, None)
+
+        while src:
+            if tgt is None or src.path < tgt.path:
+                print(f"Missing file: {src.path} on {targetDir}")
+                success = False
+                src = next(source, None)
+            elif tgt.path < src.path:
+                logging.debug(f"Additional file: {tgt.path} on {targetDir}")
+                tgt = next(target, None)
+            else:
+                if (src.size, src.digest) != (tgt.size, tgt.digest):
+                    print(f"File with wrong size or checksum: {src.path} on {targetDir}")
+                    success = False
+                src = next(source, None)
+                tgt = next(target, None)
+
+        # Drain the target manifest to let the remote command finish
+        for _tgt in target:
+            pass
+
+        return success
+
+    def _parseManifest(self, lines):
+        for line in lines:
+            (digest, size, path) = line.rstrip('\n').split(' ', 2)
+            yield types.SimpleNamespace(digest=digest, size=int(size), path=path)
+
+
+class HdbCopyProgress():
+    """ Progress reporter for copying a volume tree
+
+        Used as context manager around the copy of a volume tree.
+        The copy methods count the bytes and files which passed their
+        pipes (see addBytes(), addFiles() and getPipeCounter()), so the
+        target directory need not be scanned. Every <interval> seconds the
+        progress (bytes and files done, throughput, ETA) is printed to the
+        terminal. If <jsonFile> is set, each report is additionally appended
+        as a JSON object on a single line to <jsonFile> ('-': <jsonStream>).
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-arguments
+
+    def __init__(self, sourceDir, targetDir, total, interval, jsonFile=None, jsonStream=None):
+        self._sourceDir  = sourceDir
+        self._targetDir  = targetDir
+        self._total      = total
+        self._interval   = interval
+        self._jsonFile   = jsonFile
+        self._jsonStream = jsonStream
+
+        self._lock      = threading.Lock()
+        self._bytes     = 0
+        self._files     = 0
+        self._skipped   = 0
+        self._stop      = threading.Event()
+        self._thread    = None
+        self._startTime = None
+
+    def __enter__(self):
+        if self._interval > 0:
+            self._startTime = time.monotonic()
+            self._thread    = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._report(done=True)
+
+    # Public methods
+
+    def addBytes(self, numBytes):
+        """ Count bytes which were copied """
+        with self._lock:
+            self._bytes += numBytes
+
+    def addFiles(self, numFiles):
+        """ Count files which were copied completely """
+        with self._lock:
+            self._files += numFiles
+
+    def addSkipped(self, numBytes, numFiles):
+        """ Count files which need not be copied (e.g. when resuming a copy);
+            they are done but don't contribute to the throughput """
+        with self._lock:
+            self._bytes   += numBytes
+            self._files   += numFiles
+            self._skipped += numBytes
+
+    def getPipeCounter(self, limit):
+        """ Get a callback which is passed the cumulative number of bytes sent
+            by a pipe and counts the increase; at most <limit> bytes are counted """
+
+        counted = [0]
+
+        def onBytes(numBytes):
+            numBytes = min(numBytes, limit)
+            if numBytes > counted[0]:
+                self.addBytes(numBytes - counted[0])
+                counted[0] = numBytes
+
+        return onBytes
+
+    # Private methods
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self._report(done=False)
+
+    def _report(self, done):
+        with self._lock:
+            (numBytes, numFiles, skipped) = (self._bytes, self._files, self._skipped)
+
+        elapsed = max(time.monotonic() - self._startTime, 0.001)
+
+        rate = max(numBytes - skipped, 0) / elapsed
+        left = max(self._total.bytes - numBytes, 0)
+        eta  = int(left / rate) if rate > 0 else None
+
+        percent = min(100 * numBytes / self._total.bytes, 100) if self._total.bytes else 100
+
+        print(f"'{self._sourceDir}':"
+              f" {numBytes/1024**3:.2f} of {self._total.bytes/1024**3:.2f} GiB"
+              f" ({percent:.0f}%),"
+              f" {numFiles} of {self._total.files} file(s),"
+              f" {rate/1024**2:.1f} MiB/s,"
+              f" ETA {datetime.timedelta(seconds=eta) if eta is not None else '-'}",
+              flush=True)
+
+        if self._jsonFile:
+            self._writeJson({
+                'time':       datetime.datetime.now().isoformat(timespec='seconds'),
+                'source':     self._sourceDir,
+                'target':     self._targetDir,
+                'bytes':      numBytes,
+                'totalBytes': self._total.bytes,
+                'files':      numFiles,
+                'totalFiles': self._total.files,
+                'rate':       int(rate),
+                'eta':        eta,
+                'done':       done
+            })
+
+    def _writeJson(self, record):
+        line = json.dumps(record)
+        if self._jsonFile == '-':
+            print(line, file=self._jsonStream, flush=True)
+            return
+
+        # pylint: disable=unspecified-encoding
+        with open(self._jsonFile, 'a') as jfh:
+            jfh.write(f'{line}\n')
+
+
+class HdbCopyJournal():
+    """ Journal of completed HDB copy steps kept on the NFS server
+
+        The journal is a text file with one entry per line:
+
+            version <snapshot version directory>
+            volume  <source directory>
+            file    <size> <mtime> <source directory>/<path>
+    """
+
+    def __init__(self, cmdSsh, path, resume):
+        self._cmdSsh = cmdSsh
+        self._path   = path
+        self._lock   = threading.Lock()
+
+        self.version = None
+        self.volumes = set()
+        self.files   = {}
+
+        if resume:
+            self._read()
+        else:
+            self.remove()
+
+    # Public methods
+
+    def addVersion(self, version):
+        """ Record the snapshot version which is being created """
+        self._append([f'version {version}'])
+
+    def addVolume(self, sourceDir):
+        """ Record a completely copied and verified volume tree """
+        self._append([f'volume {sourceDir}'])
+
+    def addFiles(self, sourceDir, files):
+        """ Record completely copied files given as (size, mtime, path) """
+        self._append([f'file {size} {mtime} {sourceDir}/{path}' for (size, mtime, path) in files])
+
+    def remove(self):
+        """ Remove the journal """
+        self._cmdSsh.run(f'rm -f "{self._path}"')
+
+    # Private methods
+
+    def _read(self):
+        self._cmdSsh.runStream(f'cat "{self._path}"', self._parseLine, rcOk=(0, 1))
+
+        logging.info(f"Read journal '{self._path}': {len(self.volumes)} volume(s),"
+                     f" {len(self.files)} file(s)")
+
+    def _parseLine(self, line):
+        (kind, _sep, value) = line.partition(' ')
+        if kind == 'version':
+            self.version = value
+        elif kind == 'volume':
+            self.volumes.add(value)
+        elif kind == 'file':
+            (size, mtime, path) = value.split(' ', 2)
+            self.files[path] = (int(size), int(mtime))
+
+    def _append(self, lines):
+        # Concurrent copy streams append to the journal
+        with self._lock, tempfile.NamedTemporaryFile('w') as tmp:
+            tmp.write(''.join(f'{line}\n' for line in lines))
+            tmp.flush()
+            sshNfs = self._cmdSsh.getSshCmdAndSecrets()[0]
+            CmdShell().run(f'{sshNfs} "cat >> {self._path}" < {tmp.name}')
+
+
+# Functions
+
+def getTreeStats(cmdSsh, directory):
+    """ Get number of bytes and number of files of a directory tree on a remote host """
+
+    out = cmdSsh.run(f'du -s -b {directory} 2>/dev/null | cut -f1;'
+                     f' find {directory} -type f 2>/dev/null | wc -l', rcOk=(0, 1)).out.split()
+
+    if len(out) != 2 or not all(value.isdigit() for value in out):
+        return types.SimpleNamespace(bytes=0, files=0)
+
+    return types.SimpleNamespace(bytes=int(out[0]), files=int(out[1]))
+
+
+def getPrunableVersions(versions, current, keep):
+    """ Get the snapshot versions which exceed the <keep> newest versions
+        including the current one, oldest first
+
+        Versions are named by their creation time stamp (YYYYMMDD-HHMMSS);
+        the version 'initial' converted from a non-versioned copy is older
+        than all of them. Incomplete versions are never returned.
+    """
+
+    versions = sorted((v for v in versions if v and not v.endswith('.partial') and v != current),
+                      key=lambda v: (os.path.basename(v) != 'initial', os.path.basename(v)))
+
+    return versions[:max(0, len(versions) - keep + 1)]
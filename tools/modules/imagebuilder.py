@@ -19,8 +19,14 @@
 
 # Global modules
 
+import base64
+import contextlib
 from   datetime import date
+import fcntl
+import hashlib
 import logging
+import os
+import shutil
 import tempfile
 import types
 
@@ -36,7 +42,9 @@ from modules.fail       import fail
 from modules.remotecopy import RemoteCopy
 from modules.tools      import (
     genFileFromTemplate,
+    getExecPath,
     getRpmFileForPackage,
+    instantiateTemplate,
     pushd
 )
 
@@ -63,6 +71,8 @@ class Builder():
 
     # pylint: disable=too-many-instance-attributes
 
+    _volatileRoot = 'soos-volatile'
+
     def __init__(self, ctx):
         self._ctx         = ctx
         self._host        = None
@@ -82,6 +92,8 @@ class Builder():
         buildTmpRoot = self._ctx.ar.temp_root
         buildDir     = self._ctx.ar.build_directory
         keepFiles    = self._ctx.ar.keep_files
+        contextCache = self._ctx.ar.context_cache
+        stream       = self._ctx.ar.stream_context
 
         # Initialize ssh connection
 
@@ -113,8 +125,15 @@ class Builder():
 
         dirs = types.SimpleNamespace()
         dirs.repoRoot   = repoRoot
+        dirs.cache      = None
+        dirs.stream     = [] if stream else None  # Directory trees to be streamed into the image
         if buildDir and len(buildDir) != 0:
             dirs.build  = buildDir
+        elif contextCache:
+            dirs.cache  = f'{buildTmpRoot}/soos-context-cache/{host}-{sidU}-{self._flavor}'
+            dirs.build  = f'{dirs.cache}/context'
+            self._cmdShell.run(f'mkdir -p "{dirs.build}"')
+            logging.info(f"Using build context cache '{dirs.cache}'")
         else:
             self._cmdShell.run(f'mkdir -p "{buildTmpRoot}"')
             dirs.build  = self._cmdShell.run(f'mktemp -d -p "{buildTmpRoot}" '
@@ -155,14 +174,34 @@ class Builder():
 
         # Start build process
 
-        with tempfile.TemporaryDirectory() as dirs.tmp:
+        with self._lockContextCache(dirs), tempfile.TemporaryDirectory() as dirs.tmp:
             logging.debug(f"Created temporary directory '{dirs.tmp}'")
-            self._cleanupAtStart(dirs, keepFiles)
+            self._cleanupAtStart(dirs, keepFiles or dirs.cache)
+            image.base = self._buildBaseImage(buildCmd, dirs)
             self._genBuildContext(sidU, dirs, sapadm, sidadm, sapsysGid, host, remoteOs)
+            self._updateContextManifest(dirs)
+            self._genLayers(sidU, dirs, sidadm)
+            if dirs.stream:
+                image.base = self._streamContent(sidL, dirs, image, sidadm, sapsysGid)
             containerfile = self._genContainerfile(sidU, dirs, image, sapadm, sidadm, sapsysGid)
             self._buildImage(buildCmd, dirs, image, containerfile)
             self._cleanupAtEnd(dirs)
 
+    @contextlib.contextmanager
+    def _lockContextCache(self, dirs):
+        # Serialize builds which use the same build context cache
+        if not dirs.cache:
+            yield
+            return
+        # pylint: disable=invalid-name, unspecified-encoding
+        with open(f'{dirs.cache}/lock', 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logging.info(f"Waiting for other build using build context cache '{dirs.cache}'")
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
     def _getUsrSapReal(self):
         # Check whether /usr/sap is a real directory or a symlink to another directory
         usrSapReal = self._cmdSsh.run('readlink /usr/sap').out
@@ -181,6 +220,11 @@ class Builder():
     def _getOsUserProperties(self, sidL):
         # Get properties of sapadm and <sid>adm from remote host /etc/passwd
 
+        (sapadmResult, sidadmResult) = self._cmdSsh.runBatch([
+            'grep "^sapadm:" /etc/passwd',
+            f'grep "^{sidL}adm:" /etc/passwd'
+        ])
+
         sapadm = types.SimpleNamespace()
         (_d1,
          _d2,
@@ -189,7 +233,7 @@ class Builder():
          sapadm.comment,
          sapadm.home,
          sapadm.shell
-         ) = self._cmdSsh.run('grep "^sapadm:" /etc/passwd').out.split(':')
+         ) = sapadmResult.out.split(':')
 
         sidadm = types.SimpleNamespace()
         (_d1,
@@ -199,12 +243,45 @@ class Builder():
          sidadm.comment,
          sidadm.home,
          sidadm.shell
-         ) = self._cmdSsh.run(f'grep "^{sidL}adm:" /etc/passwd').out.split(':')
+         ) = sidadmResult.out.split(':')
 
         logging.debug(f'Returning {sapadm}, {sidadm}, {sapsysGid}')
 
         return (sapadm, sidadm, sapsysGid)
 
+    def _writeSystemFileExcerpts(self, sidU, dirs):
+        # Write SAP specific excerpts of system files of the remote host
+        # to the current directory; all excerpts are fetched with a single round trip
+
+        sidL = sidU.lower()
+
+        (sapservices,
+         servicesSap,
+         limitsSapsys,
+         limitsDba,
+         limitsSidadm) = self._cmdSsh.runBatch([
+             f'grep {sidU} /usr/sap/sapservices',
+             'grep "^sap" /etc/services',
+             'grep "@sapsys"         /etc/security/limits.conf',
+             'grep "@dba"            /etc/security/limits.conf',
+             f'grep "{sidL}adm" /etc/security/limits.conf'
+         ])
+
+        # The directory does not exist yet if /usr/sap/<SID> is streamed into the image;
+        # _genLayers() then copies it with the excerpt to the volatile build context
+
+        os.makedirs(f'.{dirs.usrSapReal}', exist_ok=True)
+
+        # pylint: disable=invalid-name, unspecified-encoding
+        with open(f'.{dirs.usrSapReal}/sapservices', 'w') as fh:
+            print(sapservices.out, file=fh)
+        with open('./etc_services_sap', 'w') as fh:
+            print(servicesSap.out, file=fh)
+        with open('./etc_security_limits.conf', 'w') as fh:
+            print(limitsSapsys.out, file=fh)
+            print(limitsDba.out, file=fh)
+            print(limitsSidadm.out, file=fh)
+
     def _cleanupAtStart(self, dirs, keepFiles):
         # Remove previously copied files if not explicitly asked to keep them
         if not keepFiles:
@@ -216,6 +293,7 @@ class Builder():
         # Generate podman build context
         # pylint: disable=too-many-arguments
         filterFilePath = f'{dirs.tmp}/rsync-filter'
+        dirs.rsyncFilter = filterFilePath
         logging.debug(f"filterFilePath: {filterFilePath}")
         try:
             # pylint: disable=invalid-name, unspecified-encoding
@@ -226,6 +304,161 @@ class Builder():
 
         self._genBuildContextFlavor(sidU, dirs, sapadm, sidadm, sapsysGid, host, filterFilePath)
 
+    def _copyToBuildContext(self, source, dirs, filterFilePath, stream=False):
+        # Copy remote directory tree to the build context;
+        # when using the build context cache, files which were removed
+        # on the remote host are also removed from the cached copy.
+        # If stream is set and the build context is streamed the directory tree
+        # is only recorded here and streamed into the image by _streamContent()
+        if stream and dirs.stream is not None:
+            dirs.stream.append(source)
+            return
+        self._remoteCopy.copy(source, filterFilePath, delete=bool(dirs.cache))
+
+    def _updateContextManifest(self, dirs):
+        # Record the contents of the cached build context as lines
+        # '<size> <mtime in ns> <path>' and log the changes since the previous build
+        # pylint: disable=too-many-locals
+
+        if not dirs.cache:
+            return
+
+        manifestPath = f'{dirs.cache}/manifest'
+
+        previous = {}
+        if os.path.isfile(manifestPath):
+            # pylint: disable=invalid-name, unspecified-encoding
+            with open(manifestPath) as fh:
+                for line in fh:
+                    (size, mtime, path) = line.rstrip('\n').split(' ', 2)
+                    previous[path] = (size, mtime)
+
+        current = {}
+        for (root, subdirs, files) in os.walk(dirs.build):
+            if root == dirs.build and self._volatileRoot in subdirs:
+                subdirs.remove(self._volatileRoot)  # generated by _genLayers()
+            for file in files:
+                fullPath = os.path.join(root, file)
+                stat = os.lstat(fullPath)
+                current[os.path.relpath(fullPath, dirs.build)] = (str(stat.st_size),
+                                                                  str(stat.st_mtime_ns))
+
+        changed = sum(1 for (path, entry) in current.items() if previous.get(path) != entry)
+        removed = sum(1 for path in previous if path not in current)
+        logging.info(f"Build context cache: {len(current)} files, {changed} new or changed,"
+                     f" {removed} removed since previous build")
+
+        try:
+            # pylint: disable=invalid-name, unspecified-encoding
+            with open(manifestPath, 'w') as fh:
+                for path in sorted(current):
+                    print(f'{current[path][0]} {current[path][1]} {path}', file=fh)
+        except IOError:
+            fail(f"Error writing to file {manifestPath}")
+
+    def _genLayers(self, sidU, dirs, sidadm):
+        # Split the build context into stable content (SAP executables) and volatile
+        # content (profiles, home directories, system file excerpts, ...).
+        # Stable directories are copied into the image in separate layers before
+        # the volatile content, so that changes of the volatile content do not
+        # invalidate the (large) layers holding the executables.
+        # The volatile trees are hard linked copies of the build context trees
+        # below dirs.volatileRoot without the stable directories.
+        # pylint: disable=assignment-from-no-return,unpacking-non-sequence
+
+        (stableCandidates, volatileTrees) = self._getLayerDirs(sidU, dirs, sidadm)
+
+        dirs.layerDirs = (stableCandidates, volatileTrees)
+        dirs.stable = [d for d in stableCandidates if self._isRealDirInBuild(dirs, d)]
+        dirs.volatileRoot = self._volatileRoot
+
+        logging.info("##### Splitting build context into stable and volatile layers #####")
+        logging.debug(f"dirs.stable: '{dirs.stable}'")
+
+        volatileRoot = f'{dirs.build}/{dirs.volatileRoot}'
+        shutil.rmtree(volatileRoot, ignore_errors=True)
+
+        for tree in volatileTrees:
+            if not os.path.lexists(f'{dirs.build}{tree}'):
+                if dirs.stream:
+                    # Tree is streamed into the image; provide an empty source for COPY
+                    os.makedirs(f'{volatileRoot}{tree}')
+                continue
+            shutil.copytree(f'{dirs.build}{tree}', f'{volatileRoot}{tree}',
+                            symlinks=True, copy_function=os.link)
+            for stableDir in dirs.stable:
+                if stableDir.startswith(f'{tree}/'):
+                    shutil.rmtree(f'{volatileRoot}{stableDir}')
+
+    def _streamContent(self, sidL, dirs, image, sidadm, sapsysGid):
+        # Stream the recorded directory trees from the source host directly into
+        # a content image on top of the base image without staging them in the
+        # build directory. The trees are packed into a tar archive on the source host
+        # (see tools/modules/symlink-closure) which is unpacked into a mounted
+        # buildah working container. Stable and volatile directories are committed
+        # as separate layers. Returns the tag of the content image.
+        # pylint: disable=too-many-arguments,too-many-locals
+
+        getExecPath('buildah')
+
+        (stable, volatile) = dirs.layerDirs
+        tag = f'localhost/soos-{sidL}-content:latest'
+
+        # pylint: disable=invalid-name, unspecified-encoding
+        with open(dirs.rsyncFilter) as fh:
+            encRules = base64.b64encode(f'{fh.read()}\n'.encode()).decode()
+
+        (sshCmd, sshSecrets) = self._cmdSsh.getSshCmdAndSecrets(withLogin=True)
+        script  = f'{dirs.repoRoot}/tools/modules/symlink-closure'
+        unshare = 'buildah unshare ' if os.geteuid() != 0 else ''  # mount needs a user namespace
+
+        fromImage = image.base
+        for (layer, within, without) in (('stable', stable, []), ('volatile', volatile, stable)):
+            logging.info(f"##### Streaming {layer} content from '{self._host}' into image #####")
+
+            res = self._cmdShell.run(f'buildah from --pull-never {fromImage}')
+            if res.rc != 0:
+                fail(f"Could not create working container from image '{fromImage}'")
+            container = res.out
+
+            remoteCmd  = f'python3 - --tar {sidadm.uid}:{sapsysGid}'
+            remoteCmd += f' --within={",".join(within)} --without={",".join(without)}'
+            remoteCmd += f' {encRules} {" ".join(dirs.stream)}'
+
+            # The return code of the pipeline is the one of tar; the return code
+            # of the remote side is recorded separately, so that an incomplete
+            # archive is not committed
+
+            with tempfile.TemporaryDirectory() as tmpDir:
+                rcFile = f'{tmpDir}/rc'
+                res = self._cmdShell.run(f'({sshCmd} "{remoteCmd}" < {script}; echo $? > {rcFile})'
+                                         f" | {unshare}sh -c 'tar -x -p --numeric-owner -f -"
+                                         f' -C "$(buildah mount {container})"\'', sshSecrets)
+                with open(rcFile) as fh:
+                    remoteRc = fh.read().strip()
+
+            if res.rc != 0 or remoteRc != '0':
+                self._cmdShell.run(f'buildah rm {container}')
+                fail(f"Streaming {layer} content from host '{self._host}' failed"
+                     f" (rc of tar: {res.rc}, rc of source host: {remoteRc})")
+
+            self._cmdShell.run(f'buildah commit --rm {container} {tag}')
+            fromImage = tag
+
+        return tag
+
+    @staticmethod
+    def _isRealDirInBuild(dirs, path):
+        # Check whether path is a directory of the build context
+        # which is not reached via a symbolic link
+        buildPath = f'{dirs.build}{path}'
+        return os.path.isdir(buildPath) and os.path.realpath(buildPath) == buildPath
+
+    def _getLayerDirs(self, sidU, dirs, sidadm):
+        # Get (stable directories, volatile directory trees) depending on flavor
+        # pylint: disable=unused-argument
+        fail('This function must be overwritten by derived flavor specific builder class.')
+
     def _getRsyncFilter(self, sidU, dirs, remoteOs):
         # Get filter for selective copy depending on flavor
         # pylint: disable=unused-argument
@@ -236,6 +469,59 @@ class Builder():
         # pylint: disable=unused-argument,too-many-arguments
         fail('This function must be overwritten by derived flavor specific builder class.')
 
+    def _buildBaseImage(self, buildCmd, dirs):
+        # Build the base image containing the OS prerequisite packages and
+        # the dnf installable optional packages if it does not yet exist;
+        # the image is tagged with a hash of its containerfile, so it is shared
+        # by all flavors and SIDs which need the same set of packages
+
+        packages  = getattr(self._ctx.cf.images, self._flavor).packages
+        pkgParams = self._getOptionalPackageParams(packages, dirs)
+
+        template = f'{dirs.repoRoot}/openshift/images/base/containerfile.template'
+        content  = instantiateTemplate(template, {
+            'INSTALL_OPT_PACKAGES': pkgParams.installOptPackagesDnf
+        })
+        digest = hashlib.sha256(content.encode()).hexdigest()[:12]
+        tag    = f'localhost/soos-base:{digest}'
+
+        # The flavors may be built concurrently by separate processes;
+        # only one of them builds a base image, the others wait for it
+
+        # pylint: disable=invalid-name, unspecified-encoding
+        with open(f'{tempfile.gettempdir()}/soos-base-{digest}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            if self._cmdShell.run(f'{buildCmd} image exists {tag}', rcOk=(0, 1)).rc == 0:
+                logging.info(f"##### Using existing base image '{tag}' #####")
+                return tag
+
+            self._buildBaseImageLocked(buildCmd, dirs, tag, content)
+
+        return tag
+
+    def _buildBaseImageLocked(self, buildCmd, dirs, tag, content):
+        # Build the base image <tag> from the containerfile <content>;
+        # the caller holds the lock for <tag>
+
+        logging.info(f"##### Building base image '{tag}' #####")
+
+        containerfile = f'{dirs.tmp}/containerfile.base'
+        contextDir    = f'{dirs.tmp}/base-context'
+        try:
+            # pylint: disable=invalid-name, unspecified-encoding
+            with open(containerfile, 'w') as fh:
+                print(content, file=fh)
+        except IOError:
+            fail(f"Error writing to file {containerfile}")
+        os.makedirs(contextDir, exist_ok=True)
+
+        res = self._cmdShell.runStream(f'{buildCmd} build -t {tag}'
+                                       f' -f "{containerfile}" "{contextDir}"',
+                                       lambda line: logging.debug(f'build: {line}'))
+        if res.rc != 0:
+            fail(f"Error: building base image '{tag}' failed with rc {res.rc}")
+
     def _genContainerfile(self, sidU, dirs, image, sapadm, sidadm, sapsysGid):
         # Generate containerfile from template depending on flavor
         # MUST RUN AFTER BUILD CONTEXT SETUP
@@ -255,6 +541,7 @@ class Builder():
         pkgParams = self._getOptionalPackageParams(packages, dirs)
 
         params = {
+            'BASE_IMAGE':                image.base,
             'IMAGE_BRANCH':              image.branch,
             'IMAGE_COMMIT':              image.commit,
             'IMAGE_DATE':                image.date,
@@ -274,9 +561,11 @@ class Builder():
             'SIDADM_UID':                sidadm.uid,
             'USR_SAP_REAL':              dirs.usrSapReal,
             'USR_SAP_LINK_CMD':          usrSapLinkCmd,
-            'INSTALL_OPT_PACKAGES':      pkgParams.installOptPackagesDnf,
             'COPY_OPT_PACKAGE_FILES':    pkgParams.copyOptPackageFiles,
-            'INSTALL_OPT_PACKAGE_FILES': pkgParams.installOptPackageFiles
+            'INSTALL_OPT_PACKAGE_FILES': pkgParams.installOptPackageFiles,
+            'COPY_STABLE_LAYERS':        '\n'.join(
+                f'COPY --chown={sidadm.uid}:{sapsysGid} .{d} {d}/' for d in dirs.stable),
+            'VOLATILE_ROOT':             f'./{dirs.volatileRoot}'
         }
 
         params.update(self._getContainerfileParams(sidU, dirs))
@@ -302,7 +591,8 @@ class Builder():
         # pylint: disable=no-self-use
         logging.info("##### Building image #####")
         with pushd(dirs.build):
-            self._cmdShell.run(f'{buildCmd} build -t {image.tag} -f "{containerfile}" .')
+            self._cmdShell.runStream(f'{buildCmd} build -t {image.tag} -f "{containerfile}" .',
+                                     lambda line: logging.debug(f'build: {line}'))
 
     def _getOptionalPackageParams(self, packages, dirs):
         # Check if optional packages must be installed
@@ -398,6 +688,20 @@ class BuilderNws4(Builder):
         # Flavor specific directories of flavor 'nws4'
         pass  # currently none
 
+    def _getLayerDirs(self, sidU, dirs, sidadm):
+        # Stable directories and volatile directory trees of flavor 'nws4'
+        stable = [
+            f'{dirs.sapmnt}/{sidU}/exe',
+            f'{dirs.usrSapReal}/{sidU}/exe',
+            f'{dirs.usrSapReal}/{sidU}/SYS/exe'
+        ]
+        volatile = [
+            dirs.usrSapReal,
+            dirs.sapmnt,
+            sidadm.home
+        ]
+        return (stable, volatile)
+
     def _getRsyncFilter(self, sidU, dirs, remoteOs):
         rsFilter = ''
         rsFilter += f"include {dirs.usrSapReal}/trans\n"
@@ -442,29 +746,16 @@ class BuilderNws4(Builder):
         # pylint: disable=too-many-arguments
         logging.info('##### Copying build context to temporary build directory #####')
 
-        sidL = sidU.lower()
-
         with pushd(dirs.build):
-            self._remoteCopy.copy(f'/usr/sap/{sidU}', filterFilePath)  # also copies /sapmnt
-            self._remoteCopy.copy('/usr/sap/trans', filterFilePath)
+            # also copies /sapmnt
+            self._copyToBuildContext(f'/usr/sap/{sidU}', dirs, filterFilePath, stream=True)
+            self._copyToBuildContext('/usr/sap/trans', dirs, filterFilePath, stream=True)
             # SAP host agent
-            # self._remoteCopy.copy(f'/usr/sap/hostctrl', filterFilePath)
-            # self._remoteCopy.copy(f'{sapadm.home}', filterFilePath)
-            self._remoteCopy.copy(f'{sidadm.home}', filterFilePath)
+            # self._copyToBuildContext(f'/usr/sap/hostctrl', dirs, filterFilePath)
+            # self._copyToBuildContext(f'{sapadm.home}', dirs, filterFilePath)
+            self._copyToBuildContext(f'{sidadm.home}', dirs, filterFilePath, stream=True)
 
-            # pylint: disable=invalid-name, unspecified-encoding
-            with open(f'.{dirs.usrSapReal}/sapservices', 'w') as fh:
-                print(self._cmdSsh.run(f'grep {sidU} /usr/sap/sapservices').out, file=fh)
-            with open('./etc_services_sap', 'w') as fh:
-                print(self._cmdSsh.run('grep "^sap" /etc/services').out, file=fh)
-
-            with open('./etc_security_limits.conf', 'w') as fh:
-                print(self._cmdSsh.run('grep "@sapsys"         /etc/security/limits.conf').out,
-                      file=fh)
-                print(self._cmdSsh.run('grep "@dba"            /etc/security/limits.conf').out,
-                      file=fh)
-                print(self._cmdSsh.run(f'grep "{sidL}adm" /etc/security/limits.conf').out,
-                      file=fh)
+            self._writeSystemFileExcerpts(sidU, dirs)
 
             contentBase = f'{dirs.repoRoot}/openshift/images/nws4/image-content'
 
@@ -496,6 +787,17 @@ class BuilderHdb(Builder):
         logging.debug(f"dirs.hanaSharedSid: '{dirs.hanaSharedSid}'")
         dirs.defaultPackagesDir = self._ctx.cs.defaultPackagesDir
 
+    def _getLayerDirs(self, sidU, dirs, sidadm):
+        # Stable directories and volatile directory trees of flavor 'hdb'
+        stable = [
+            f'{dirs.hanaSharedSid}/exe'
+        ]
+        volatile = [
+            dirs.usrSapReal,
+            dirs.hanaSharedSid
+        ]
+        return (stable, volatile)
+
     def _getRsyncFilter(self, sidU, dirs, remoteOs):
         rsFilter = ''
         rsFilter +=  'exclude **.zip\n'
@@ -516,30 +818,17 @@ class BuilderHdb(Builder):
 
         logging.info('##### Copying build context to temporary build directory #####')
 
-        sidL = sidU.lower()
-
         # copy default packages dir to build dir
         self._cmdShell.run(f'mkdir -p {dirs.build}{dirs.defaultPackagesDir}')
         self._cmdShell.run(f'cp -af {dirs.defaultPackagesDir}/* '
                            f'{dirs.build}{dirs.defaultPackagesDir}')
 
         with pushd(dirs.build):
-            self._remoteCopy.copy(dirs.hanaSharedSid, filterFilePath)
-            self._remoteCopy.copy('/etc/sysctl.conf', filterFilePath)
-            self._remoteCopy.copy('/etc/pam.d/sapstartsrv', filterFilePath)
-            self._remoteCopy.copy('/etc/security/limits.d/99-sapsys.conf', filterFilePath)
-            # pylint: disable=invalid-name, unspecified-encoding
-            with open(f'.{dirs.usrSapReal}/sapservices', 'w') as fh:
-                print(self._cmdSsh.run(f'grep {sidU} /usr/sap/sapservices').out, file=fh)
-            with open('./etc_services_sap', 'w') as fh:  # pylint: disable=invalid-name
-                print(self._cmdSsh.run('grep "^sap" /etc/services').out, file=fh)
-            with open('./etc_security_limits.conf', 'w') as fh:
-                print(self._cmdSsh.run('grep "@sapsys"         /etc/security/limits.conf').out,
-                      file=fh)
-                print(self._cmdSsh.run('grep "@dba"            /etc/security/limits.conf').out,
-                      file=fh)
-                print(self._cmdSsh.run(f'grep "{sidL}adm" /etc/security/limits.conf').out,
-                      file=fh)
+            self._copyToBuildContext(dirs.hanaSharedSid, dirs, filterFilePath, stream=True)
+            self._copyToBuildContext('/etc/sysctl.conf', dirs, filterFilePath)
+            self._copyToBuildContext('/etc/pam.d/sapstartsrv', dirs, filterFilePath)
+            self._copyToBuildContext('/etc/security/limits.d/99-sapsys.conf', dirs, filterFilePath)
+            self._writeSystemFileExcerpts(sidU, dirs)
 
             contentBase = f'{dirs.repoRoot}/openshift/images/hdb/image-content'
 
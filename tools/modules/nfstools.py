@@ -19,7 +19,10 @@
 
 # Global modules
 
-import os
+import base64
+import bisect
+import json
+import time
 import types
 import uuid
 import logging
@@ -47,6 +50,15 @@ def getHdbCopyBase(ctx):
     return f'{ctx.cf.nfs.bases.copy}/{ctx.cf.refsys.hdb.host.name}/{ctx.cf.refsys.hdb.sidU}'
 
 
+def getHdbCopyVersionsBase(ctx):
+    """ Get base directory where versioned SAP HANA database snapshots are kept
+
+        If versioned snapshots are used the directory returned by getHdbCopyBase()
+        is a symbolic link to the current version.
+    """
+    return f'{getHdbCopyBase(ctx)}.versions'
+
+
 def getOverlayBase(ctx, overlayUuid):
     """ Get base directory under which overlay file systems for container instances are created """
     return f'{ctx.cf.nfs.bases.overlay}/{overlayUuid}'
@@ -111,15 +123,131 @@ def getValidNfsServerAddress(ctx):
     del ocp
     return ipAddr
 
+
+def _getOverlayRegistryCmd(ctx, *args):
+    """ Get the command which runs tools/modules/overlay-registry with args on the NFS server
+
+        The script is passed in-line so that the command can be part of a command batch.
+    """
+    # pylint: disable=unspecified-encoding
+    with open(f'{ctx.cf.build.repo.root}/tools/modules/overlay-registry') as fh:
+        script = base64.b64encode(fh.read().encode()).decode()
+    return (f"printf %s '{script}' | base64 -d"
+            f" | python3 - {ctx.cf.nfs.bases.overlay} {' '.join(args)}")
+
+
+def _getOverlayRecords(res):
+    """ Get the overlay records from the result of an overlay-registry run """
+    if res.rc != 0:
+        fail(f'Could not access the overlay registry on the NFS server:\n{res.err}')
+    return json.loads(res.out)
+
 # Classes
 
 
+class NfsConfigUpdate():
+    """ Batch of changes to /etc/fstab and /etc/exports on the NFS server
+
+        The changes are applied by a list of shell commands (see getCmds()):
+        each file is rewritten atomically (edited copy renamed over the original,
+        previous version kept as <file>.backup), and only the changed exports are
+        exported (exportfs -o) or unexported (exportfs -u) instead of re-exporting
+        all file systems by 'exportfs -ar'. The NFS server is shared by several
+        users, so the files are rewritten under an exclusive lock.
+    """
+
+    _fstab    = '/etc/fstab'
+    _exports  = '/etc/exports'
+    _lockFile = '/var/lock/soos-nfs-config.lock'
+
+    def __init__(self):
+        self._fstabAdd      = []  # lines
+        self._fstabEdits    = []  # sed scripts
+        self._exportsAdd    = []  # (path, options)
+        self._exportsRemove = []  # sed regular expressions
+
+    def addFstabEntry(self, line):
+        """ Add a line to /etc/fstab """
+        self._fstabAdd.append(line)
+
+    def removeFstabEntries(self, regex):
+        """ Remove all lines matching regex from /etc/fstab """
+        self._fstabEdits.append(f'/{regex}/d')
+
+    def substituteFstab(self, old, new):
+        """ Replace all occurrences of old by new in /etc/fstab """
+        self._fstabEdits.append(f's|{old}|{new}|g')
+
+    def addExport(self, path, options):
+        """ Export path to all clients with the given options """
+        self._exportsAdd.append((path, options))
+
+    def removeExports(self, regex):
+        """ Unexport all exports whose line in /etc/exports matches regex """
+        self._exportsRemove.append(regex)
+
+    def getCmds(self, mountCmds=()):
+        """ Get the commands which apply the changes; mountCmds are executed
+            after /etc/fstab was updated and before the new exports are exported """
+
+        cmds = []
+
+        for regex in self._exportsRemove:
+            cmds.append(f"awk '/{regex}/ {{print $1}}' {self._exports}"
+                        f' | while read path; do exportfs -u "*:$path"; done')
+
+        cmds.append(self._getFileUpdateCmd(self._fstab, self._fstabEdits, self._fstabAdd))
+        cmds.append(self._getFileUpdateCmd(self._exports,
+                                           [f'/{regex}/d' for regex in self._exportsRemove],
+                                           [f'{path} *({options})'
+                                            for (path, options) in self._exportsAdd]))
+        cmds += mountCmds
+
+        for (path, options) in self._exportsAdd:
+            cmds.append(f'exportfs -o {options} "*:{path}"')
+
+        return [cmd for cmd in cmds if cmd]
+
+    def _getFileUpdateCmd(self, path, sedScripts, addLines):
+        # Edit a uniquely named copy of the file and rename it over the original;
+        # concurrent updates of the same file are serialized by flock
+        if not sedScripts and not addLines:
+            return None
+        tmp = f'{path}.soos-new.$$'
+        cmd = f'cp -p {path} {tmp}'
+        for sedScript in sedScripts:
+            cmd += f' && sed -i -e "{sedScript}" {tmp}'
+        if addLines:
+            cmd += ' && printf "%s\\n"' + ''.join(f' "{line}"' for line in addLines)
+            cmd += f' >> {tmp}'
+        cmd += f' && cp -p {path} {path}.backup && mv {tmp} {path} || {{ rm -f {tmp}; false; }}'
+        return f"flock {self._lockFile} sh -c '{cmd}'"
+
+
 class Overlay():
     """ Representation of an overlay filesystem share """
 
+    # pylint: disable=too-many-instance-attributes
+
+    _trashDir         = '.soos-trash'
+    _purgeParallelism = 8
+
     @staticmethod
-    def create(ctx, overlayUuid):
+    def create(ctx, overlayUuid, appName=None):
         """ Create a new overlay filesystem share on the NFS server """
+        return Overlay.createMany(ctx, [overlayUuid], [appName])[0]
+
+    @staticmethod
+    def createMany(ctx, overlayUuids, appNames=None):
+        """ Create new overlay filesystem shares on the NFS server
+
+            All shares are created, exported and added to the overlay registry
+            by a single batch of commands on the NFS server. appNames optionally
+            contains the application name of the deployment using each share.
+            Returns the list of created overlays.
+        """
+
+        # pylint: disable=too-many-locals
 
         cmdSsh = CmdSsh(ctx, ctx.cf.nfs.host.name, ctx.cr.nfs.user)
 
@@ -142,80 +270,99 @@ class Overlay():
         # nfsOpts.append('redirect_dir=nofollow')
         # nfsOpts.append('xino=on')
 
-        # Create the directory structure for each overlay file system,
-        # establish the overlay fs and add a corresponding entry to /etc/exports
-
         exportOptsGeneric = ''
         exportOptsGeneric += 'rw'
         exportOptsGeneric += ',insecure'
         exportOptsGeneric += ',no_root_squash'
         exportOptsGeneric += ',sync'
 
-        for subDir in getHdbSubDirs(ctx):
-            ovld = getOverlayDirs(ctx, subDir.path, overlayUuid)
-            cmdSsh.run(f'mkdir -p "{ovld.upper}" "{ovld.work}" "{ovld.merged}"')
+        # Pin the lower directories to the current HDB snapshot version
+        # in case versioned snapshots are used; a later snapshot refresh
+        # must not change the lower directory of an existing overlay.
+        # The lower directories are the same for all overlays.
 
-            # Add to /etc/fstab for automatic mount after reboot
-            # use noauto,x-systemd.automount to mount via systemd and automount
+        subDirs = getHdbSubDirs(ctx)
+        lowers  = cmdSsh.runBatch([f'readlink -f "{getOverlayDirs(ctx, subDir.path, "").lower}"'
+                                   for subDir in subDirs])
 
-            fstabOpts = f'noauto,x-systemd.automount,{",".join(nfsOpts)},'
-            fstabOpts += f'lowerdir={ovld.lower},upperdir={ovld.upper},workdir={ovld.work}'
-            cmdSsh.run(f'echo "overlay {ovld.merged} overlay {fstabOpts} 0 0" >> /etc/fstab')
+        cmds       = []
+        mountCmds  = []
+        nfsUpdate  = NfsConfigUpdate()
 
-            mountCmd = f'mount {ovld.merged}'
+        for overlayUuid in overlayUuids:
 
-            cmdSsh.run(mountCmd)
+            # Create the directory structure for each overlay file system,
+            # establish the overlay fs and add a corresponding entry to /etc/exports
 
-            # Need to make the file systems unique - otherwise rpc.mountd
-            # will always offer the first mounted file system.
+            for (subDir, lower) in zip(subDirs, lowers):
+                ovld = getOverlayDirs(ctx, subDir.path, overlayUuid)
+                if lower.out:
+                    ovld.lower = lower.out
 
-            exportOpts = exportOptsGeneric + f',fsid={uuid.uuid1()}'
+                cmds.append(f'mkdir -p "{ovld.upper}" "{ovld.work}" "{ovld.merged}"')
 
-            cmdSsh.run(f'echo "{ovld.merged} *({exportOpts})" >> /etc/exports')
+                # Add to /etc/fstab for automatic mount after reboot
+                # use noauto,x-systemd.automount to mount via systemd and automount
 
-        # Create the persistence directories
+                fstabOpts = f'noauto,x-systemd.automount,{",".join(nfsOpts)},'
+                fstabOpts += f'lowerdir={ovld.lower},upperdir={ovld.upper},workdir={ovld.work}'
+                nfsUpdate.addFstabEntry(f'overlay {ovld.merged} overlay {fstabOpts} 0 0')
 
-        persistenceDir = getPersistenceDir(ctx, overlayUuid)
+                mountCmds.append(f'mount {ovld.merged}')
 
-        persistenceDirNws4 = f'{persistenceDir}/{ctx.cf.refsys.nws4.sidU}'
+                # Need to make the file systems unique - otherwise rpc.mountd
+                # will always offer the first mounted file system.
 
-        cmdSsh.run(f'mkdir -p "{persistenceDirNws4}"')
-        cmdSsh.run(f'chown {ctx.cf.refsys.nws4.sidadm.uid}:{ctx.cf.refsys.nws4.sidadm.gid}'
-                   f' "{persistenceDirNws4}"')
-        cmdSsh.run(f'chmod 755 "{persistenceDirNws4}"')
+                exportOpts = exportOptsGeneric + f',fsid={uuid.uuid1()}'
 
-        persistenceDirHdb = f'{persistenceDir}/{ctx.cf.refsys.hdb.sidU}'
+                nfsUpdate.addExport(ovld.merged, exportOpts)
 
-        cmdSsh.run(f'mkdir -p "{persistenceDirHdb}"')
-        cmdSsh.run(f'chown {ctx.cf.refsys.hdb.sidadm.uid}:{ctx.cf.refsys.hdb.sidadm.gid}'
-                   f' "{persistenceDirHdb}"')
-        cmdSsh.run(f'chmod 755 "{persistenceDirHdb}"')
+            # Create the persistence directories
 
-        cmdSsh.run(f'echo "{persistenceDir} *({exportOptsGeneric})" >> /etc/exports')
+            persistenceDir = getPersistenceDir(ctx, overlayUuid)
 
-        # Export the overlay and persistence file systems
+            for refsys in (ctx.cf.refsys.nws4, ctx.cf.refsys.hdb):
+                persistenceDirSid = f'{persistenceDir}/{refsys.sidU}'
+                cmds.append(f'mkdir -p "{persistenceDirSid}"')
+                cmds.append(f'chown {refsys.sidadm.uid}:{refsys.sidadm.gid} "{persistenceDirSid}"')
+                cmds.append(f'chmod 755 "{persistenceDirSid}"')
 
-        cmdSsh.run('exportfs -ar')
+            nfsUpdate.addExport(persistenceDir, exportOptsGeneric)
 
-        # Return the uuid of the created file systems
+        # Update /etc/fstab and /etc/exports, mount and export
+        # the overlay and persistence file systems
 
-        return Overlays(ctx).find(overlayUuid)
+        # Register the file systems
 
-    # Instance methods
+        created = time.strftime('%Y-%m-%d %H:%M')
+        records = [{'uuid': overlayUuid, 'created': created, 'owner': ctx.cr.ocp.user.name,
+                    'appName': appName, 'upperSize': 0}
+                   for (overlayUuid, appName)
+                   in zip(overlayUuids, appNames or [None]*len(overlayUuids))]
+        encRecords = base64.b64encode(json.dumps(records).encode()).decode()
 
-    # pylint: disable=too-many-arguments
+        results = cmdSsh.runBatch(cmds + nfsUpdate.getCmds(mountCmds)
+                                  + [_getOverlayRegistryCmd(ctx, 'add', encRecords)])
 
-    def __init__(self, ctx, overlayUuid, creationDate, creationTime):
-        """ Create an internal data structure representing an
-            existing overlay filesystem share on the NFS server """
+        # Return the created file systems
 
-        self._ctx = ctx
+        overlays = Overlays(ctx, _getOverlayRecords(results[-1]))
+        return [overlays.find(overlayUuid) for overlayUuid in overlayUuids]
+
+    # Instance methods
+
+    def __init__(self, ctx, record):
+        """ Create an internal data structure representing an existing overlay
+            filesystem share on the NFS server from its overlay registry record """
 
-        self.uuid = overlayUuid
-        self.date = creationDate
-        self.time = creationTime
+        self._ctx = ctx
 
-        self._cmdSsh = CmdSsh(ctx, ctx.cf.nfs.host.name, ctx.cr.nfs.user)
+        self.uuid      = record['uuid']
+        (self.date, self.time) = record['created'].split()
+        self.owner     = record.get('owner')
+        self.appName   = record.get('appName')
+        self.upperSize = record.get('upperSize')
+        self.mounted   = record.get('mounted', False)
 
     def __str__(self):
         # return f"{self.uuid} ({self.date} {self.time})"
@@ -223,61 +370,91 @@ class Overlay():
 
     def delete(self):
         """ Delete an overlay filesystem share on the NFS server """
+        Overlay.deleteMany(self._ctx, [self])
+
+    @staticmethod
+    def deleteMany(ctx, overlays):
+        """ Delete overlay filesystem shares on the NFS server
+
+            All shares are unexported, unmounted and moved to the trash
+            directory of the overlay base by a single batch of commands
+            on the NFS server, so that their uuids are freed immediately.
+            The content of the trash directory is deleted by parallel
+            'rm' processes in the background on the NFS server.
+        """
 
-        # Remove the entries for the overlay and persistence file systems from /etc/exports
+        cmdSsh    = CmdSsh(ctx, ctx.cf.nfs.host.name, ctx.cr.nfs.user)
+        trashDir  = f'{ctx.cf.nfs.bases.overlay}/{Overlay._trashDir}'
+        nfsUpdate = NfsConfigUpdate()
+        cmds      = []
 
-        self._cmdSsh.run(f'sed -i.backup -e "/.*{self.uuid}.*/d" /etc/exports')
+        for overlay in overlays:
 
-        # Remove the entries for the overlay and persistence file systems from /etc/fstab
+            # Unexport the overlay and persistence file systems and remove
+            # their entries from /etc/exports and /etc/fstab
 
-        self._cmdSsh.run(f'sed -i.backup -e "/overlay .*{self.uuid}.*/d" /etc/fstab')
+            nfsUpdate.removeExports(f'.*{overlay.uuid}.*')
+            nfsUpdate.removeFstabEntries(f'overlay .*{overlay.uuid}.*')
 
-        # Remove the overlay file systems from the table of exported NFS file systems
+            # Unmount all overlay file systems (lazily if they are busy) and move
+            # the overlay base directory including the persistence directory to
+            # the trash directory (a rename within the same file system)
 
-        self._cmdSsh.run('exportfs -ar')
+            for subDir in getHdbSubDirs(ctx):
+                ovld = getOverlayDirs(ctx, subDir.path, overlay.uuid)
+                cmds.append(f'umount {ovld.merged} || umount -l {ovld.merged}')
 
-        # Tear down all overlay file systems
+            cmds.append(f'mkdir -p {trashDir} && mv {getOverlayBase(ctx, overlay.uuid)}'
+                        f' {trashDir}/{overlay.uuid}.$(date +%s%N)')
 
-        for subDir in getHdbSubDirs(self._ctx):
-            ovld = getOverlayDirs(self._ctx, subDir.path, self.uuid)
-            self._cmdSsh.run(f'umount {ovld.merged}')
-            self._cmdSsh.run(f'rm -rf {ovld.base}/{subDir.path}*/* 2>/dev/null')
-            self._cmdSsh.run(f'rmdir -p {ovld.base}/{subDir.path}* 2>/dev/null')
+        # Remove the overlays from the overlay registry
 
-        # Tear down the persistence file system
+        cmds.append(_getOverlayRegistryCmd(ctx, 'remove', *[ovl.uuid for ovl in overlays]))
 
-        persistenceDir = getPersistenceDir(self._ctx, self.uuid)
+        # Empty the trash directory in the background; concurrent runs are serialized
 
-        self._cmdSsh.run(f'rm -rf {persistenceDir}/* 2>/dev/null')
-        self._cmdSsh.run(f'rmdir -p {persistenceDir} 2>/dev/null')
+        purgeCmd  = f'cd {trashDir} && for d in *; do [ -d "$d" ] || continue;'
+        purgeCmd += ' find "$d" ! -type d -print0'
+        purgeCmd += f' | xargs -0 -r -n 1000 -P {Overlay._purgeParallelism} rm -f;'
+        purgeCmd += ' rm -rf "$d"; done'
+        cmds.append(f"nohup flock {trashDir}/.lock sh -c '{purgeCmd}'"
+                    f' >/dev/null 2>&1 </dev/null &')
+
+        cmdSsh.runBatch(nfsUpdate.getCmds() + cmds)
 
 
 class Overlays():
     """ Existing overlay file system shares """
 
-    def __init__(self, ctx):
+    def __init__(self, ctx, records=None, withUsage=False):
+        """ Read the overlay registry on the NFS server unless the overlay
+            registry records are given; if withUsage is set the size of the
+            upper directories of all overlays is determined before """
 
-        cmdSsh = CmdSsh(ctx, ctx.cf.nfs.host.name, ctx.cr.nfs.user)
-        lssCmd = f"ls -ladtr --time-style=long-iso {ctx.cf.nfs.bases.overlay}/*-*-*-*-*"
+        if records is None:
+            cmdSsh  = CmdSsh(ctx, ctx.cf.nfs.host.name, ctx.cr.nfs.user)
+            command = 'usage' if withUsage else 'list'
+            records = _getOverlayRecords(cmdSsh.runBatch([_getOverlayRegistryCmd(ctx, command)])[0])
+
+        self._overlays = [Overlay(ctx, record) for record in records]
 
-        self._overlays = []
+        # Index of the overlays sorted by uuid for prefix search
 
-        for line in cmdSsh.run(lssCmd, rcOk=(0, 1, 2)).out.split('\n'):
-            if not line or line == '':
-                continue
-            (_d1, _d2, _d3, _d4, _d5, creationDate, creationTime, file) = line.split()
-            self._overlays.append(
-                Overlay(ctx, os.path.basename(file), creationDate, creationTime)
-            )
+        self._byUuid = {ovl.uuid: ovl for ovl in self._overlays}
+        self._uuids  = sorted(self._byUuid)
 
     def get(self):
-        """ Get list of existing overlay filesystem shares """
+        """ Get list of existing overlay filesystem shares ordered by creation time """
         return self._overlays
 
     def find(self, uuidPrefix):
         """ Find an existing overlay which matches a given UUID prefix """
 
-        found = [ovl for ovl in self._overlays if ovl.uuid.startswith(uuidPrefix)]
+        found = []
+        for ovlUuid in self._uuids[bisect.bisect_left(self._uuids, uuidPrefix):]:
+            if not ovlUuid.startswith(uuidPrefix):
+                break
+            found.append(self._byUuid[ovlUuid])
 
         if len(found) < 1:
             fail(f"Found no matching overlay uuid for uuid prefix '{uuidPrefix}'")
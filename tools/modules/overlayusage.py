@@ -0,0 +1,144 @@
+# ------------------------------------------------------------------------
+# Copyright 2022 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------
+
+""" Usage of the upper directories of overlay shares and its growth over time """
+
+
+# Global modules
+
+import datetime
+import json
+import logging
+import os
+import types
+
+
+# Local modules
+
+from modules.nfstools import Overlays
+
+
+# Classes
+
+class OverlayUsage():
+    """ Collect the size of the upper directories of all overlay shares
+
+        The sizes are determined on the NFS server by a single 'du' run
+        (see tools/modules/overlay-registry). Each collection is appended as
+        a sample to a time series file in the user's home directory from
+        which the growth of each overlay share is computed.
+    """
+
+    _seriesFilePath = '~/.cache/soos/overlay-usage.jsonl'
+    _maxSamples     = 1000
+
+    def __init__(self, ctx):
+        self._ctx     = ctx
+        self._nfsHost = ctx.cf.nfs.host.name
+        self._samples = []
+        self._load()
+
+    def collect(self):
+        """ Determine the current upper directory sizes, record them as new
+            sample and return the list of existing overlay shares """
+
+        overlays = Overlays(self._ctx, withUsage=True).get()
+
+        sample = {
+            'time':    datetime.datetime.now().isoformat(timespec='seconds'),
+            'nfsHost': self._nfsHost,
+            'sizes':   {ovl.uuid: ovl.upperSize for ovl in overlays}
+        }
+        self._samples.append(sample)
+        self._save()
+
+        return overlays
+
+    def getGrowth(self, overlay):
+        """ Get the growth of the upper directory size of overlay since the
+            oldest recorded sample; returns a namespace with the attributes
+            'since', 'bytes' and 'bytesPerDay' or None if there is no history """
+
+        samples = [s for s in self._samples if overlay.uuid in s['sizes']]
+        if len(samples) < 2:
+            return None
+
+        (first, last) = (samples[0], samples[-1])
+        since   = datetime.datetime.fromisoformat(first['time'])
+        seconds = (datetime.datetime.fromisoformat(last['time']) - since).total_seconds()
+        growth  = last['sizes'][overlay.uuid] - first['sizes'][overlay.uuid]
+
+        return types.SimpleNamespace(
+            since       = first['time'],
+            bytes       = growth,
+            bytesPerDay = int(growth * 86400 / seconds) if seconds > 0 else None
+        )
+
+    def toJson(self, overlays):
+        """ Get the usage of overlays including their growth as JSON document """
+
+        report = []
+        for ovl in overlays:
+            growth = self.getGrowth(ovl)
+            report.append({
+                'uuid':      ovl.uuid,
+                'created':   f'{ovl.date} {ovl.time}',
+                'owner':     ovl.owner,
+                'appName':   ovl.appName,
+                'mounted':   ovl.mounted,
+                'upperSize': ovl.upperSize,
+                'growth':    vars(growth) if growth else None
+            })
+
+        return json.dumps({'nfsHost': self._nfsHost, 'overlays': report}, indent=2)
+
+    # Private methods
+
+    def _load(self):
+        try:
+            # pylint: disable=invalid-name
+            with open(os.path.expanduser(self._seriesFilePath), encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        sample = json.loads(line)
+                    except ValueError:
+                        continue
+                    if sample.get('nfsHost') == self._nfsHost:
+                        self._samples.append(sample)
+        except OSError:
+            pass
+
+    def _save(self):
+        # Keep the most recent samples of each NFS server
+
+        seriesFilePath = os.path.expanduser(self._seriesFilePath)
+        try:
+            # pylint: disable=invalid-name
+            others = []
+            try:
+                with open(seriesFilePath, encoding='utf-8') as fh:
+                    others = [line for line in fh
+                              if f'"nfsHost": "{self._nfsHost}"' not in line]
+            except OSError:
+                pass
+            os.makedirs(os.path.dirname(seriesFilePath), exist_ok=True)
+            with open(f'{seriesFilePath}.tmp', 'w', encoding='utf-8') as fh:
+                fh.writelines(others)
+                for sample in self._samples[-self._maxSamples:]:
+                    fh.write(f'{json.dumps(sample)}\n')
+            os.replace(f'{seriesFilePath}.tmp', seriesFilePath)
+        except OSError as exp:
+            logging.debug(f"Could not write overlay usage file '{seriesFilePath}': {exp}")
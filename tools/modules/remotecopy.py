@@ -19,6 +19,7 @@
 
 # Global modules
 
+import base64
 import logging
 import os
 import tempfile
@@ -51,25 +52,41 @@ class RemoteCopy():
         self._host = host
         self._user = user
         self._filterFilePath = filterFilePath
+        self._repoRoot = ctx.cf.build.repo.root
 
         # Initialize ssh connection
 
         self._cmdSsh = CmdSsh(ctx, host, user)
         self._rsyncSsh, self._rsyncSshSecrets = self._cmdSsh.getSshCmdAndSecrets(withLogin=False)
 
-    def _runRsync(self, source, filterFilePath, verbose, dryRun):
+    def _runRsync(self, source, filterFilePath, verbose, dryRun, delete):
+        """ Run rsync and return a dict {<local symlink path>: <target>}
+            of all symlinks transferred by this run """
+
+        # pylint: disable=too-many-arguments
+
         logging.debug(f'source: >>>{source}<<<')
         cmdShell = CmdShell()
-        cmd = 'rsync -a --relative'
+        symlinks = {}
+
+        def onLine(line):
+            self._logRsyncOutput(line)
+            if ' -> ' in line:
+                (symlink, target) = line.split(' -> ', 1)
+                symlinks[f'./{symlink}'] = target
+
+        cmd = 'rsync -a --relative --out-format="%n%L"'
         cmd += f' -e "{self._rsyncSsh}"'
         if verbose > 0:
             cmd += ' -'+'v'*verbose
         cmd += f' -f "merge {filterFilePath}"'
         if dryRun:
             cmd += ' -n'
+        if delete:
+            cmd += ' --delete'
         if not isinstance(source, list):
             cmd += f' {self._user.name}@{self._host}:{source} ./'
-            cmdShell.run(cmd, self._rsyncSshSecrets)
+            cmdShell.runStream(cmd, onLine, self._rsyncSshSecrets)
         else:
             with tempfile.NamedTemporaryFile(mode='w') as tfh:
                 tfh.write("\n".join(str(fn) for fn in source))
@@ -82,7 +99,25 @@ class RemoteCopy():
                 logging.debug('<<<')
                 cmd += f' -r --files-from={tfh.name}'
                 cmd += f' {self._user.name}@{self._host}:/ ./'
-                cmdShell.run(cmd, self._rsyncSshSecrets)
+                cmdShell.runStream(cmd, onLine, self._rsyncSshSecrets)
+        logging.debug(f'symlinks transferred: >>>{symlinks}<<<')
+        return symlinks
+
+    def _logRsyncOutput(self, line):
+        logging.debug(f'rsync: {line}')
+
+    def _getLocalSymlinks(self, roots):
+        """ Get a dict {<local symlink path>: <target>} of all symlinks
+            in the local copies of the directory trees <roots> """
+
+        symlinks = {}
+        for root in roots:
+            for (dirPath, dirNames, fileNames) in os.walk(f'.{root}'):
+                for name in dirNames + fileNames:
+                    path = os.path.join(dirPath, name)
+                    if os.path.islink(path):
+                        symlinks[path] = os.readlink(path)
+        return symlinks
 
     def _getRealPathAndSymlinks(self, path, targets):
         logging.debug(f"path '{path}', targets '{targets}'")
@@ -117,7 +152,7 @@ class RemoteCopy():
                           f"to absolute target '{linkTarget}'")
         return linkTarget
 
-    def copy(self, source, filterFilePath=None, verbose=1, dryRun=False):
+    def copy(self, source, filterFilePath=None, verbose=1, dryRun=False, delete=False):  # pylint: disable=too-many-arguments
         """ Perform remote copy
 
         Parameters:
@@ -129,6 +164,8 @@ class RemoteCopy():
                         choices: [0, 1, 2, 3], corresponding to rsync verbose levels
                         [<none>, '-v', '-vv', '-vvv']
         dryRun        : optional: if set to True, perform a trial rsync run with no changes made'
+        delete        : optional: if set to True, delete local files in the copied
+                        directory trees which do not exist on the remote host
 
         """
 
@@ -141,51 +178,102 @@ class RemoteCopy():
         logging.debug(f'filterFilePath >>>{filterFilePath}<<<')
         logging.debug(f'verbose        >>>{verbose       }<<<')
         logging.debug(f'dryRun         >>>{dryRun        }<<<')
+        logging.debug(f'delete         >>>{delete        }<<<')
 
-        cmdShell = CmdShell()
+        if self._copyClosure(source, filterFilePath, verbose, dryRun, delete):
+            logging.info(f"Remote copy of '{source}' finished.")
+            return
+
+        logging.info(f"Could not compute symlink closure on host '{self._host}'"
+                     f" - falling back to iterative copy")
+
+        self._copyIterative(source, filterFilePath, verbose, dryRun, delete)
+
+        logging.info(f"Remote copy of '{source}' finished.")
+
+    def _copyClosure(self, source, filterFilePath, verbose, dryRun, delete):
+        """ Copy the source directory tree and the trees of all symlink targets
+            (transitively) by means of a single rsync call
+
+            The symlink closure is computed on the remote host in one
+            invocation (see tools/modules/symlink-closure).
+            Returns False if the closure could not be computed.
+        """
+
+        # pylint: disable=too-many-arguments,too-many-locals
+
+        # pylint: disable=unspecified-encoding
+        with open(filterFilePath) as ffh:
+            encRules = base64.b64encode(f'{ffh.read()}\n'.encode()).decode()
+
+        sshCmd, sshSecrets = self._cmdSsh.getSshCmdAndSecrets(withLogin=True)
+
+        res = CmdShell().run(f'{sshCmd} "python3 - {encRules} {source}"'
+                             f' < {self._repoRoot}/tools/modules/symlink-closure', sshSecrets)
+        if res.rc != 0:
+            return False
+
+        paths = set()
+        for line in res.out.split('\n'):
+            (kind, _sep, path) = line.partition(' ')
+            if kind in ('root', 'link'):
+                paths.add(path)
+
+        if not paths:
+            return False
+
+        logging.debug(f'Symlink closure of {source}: >>>{sorted(paths)}<<<')
+
+        self._runRsync(sorted(paths), filterFilePath, verbose, dryRun, delete)
+
+        return True
+
+    def _copyIterative(self, source, filterFilePath, verbose, dryRun, delete):
+        """ Copy the source directory tree and the trees of all symlink targets
+            by iteratively resolving the symlinks which arrived locally
+
+            rsync reports only the symlinks it transferred; symlinks which
+            were already up to date in an existing local copy (e.g. in the
+            build context cache) are taken from the local copied trees.
+        """
+
+        # pylint: disable=too-many-arguments,too-many-locals
+
+        def rsyncRoots(roots):
+            symlinks = self._runRsync(roots, filterFilePath, verbose, dryRun, delete)
+            if not dryRun:
+                symlinks.update(self._getLocalSymlinks(roots if isinstance(roots, list)
+                                                       else [roots]))
+            return symlinks
 
-        symlinksVisited = []
-        existingSymlinks = cmdShell.run('find ./ -type l').out
-        if existingSymlinks:
-            # Do not follow local existing symlinks
-            symlinksVisited = existingSymlinks.strip().split('\n')
-        logging.debug(f'symlinksVisited >>>{symlinksVisited}<<<')
         # rsync root of source directory supplied on command line
         (realPath, targets) = self._getRealPathAndSymlinks(source, {})
-        self._runRsync(realPath, filterFilePath, verbose, dryRun)
-        # If root of source directory tree is a symlink itself append it to list of visited links
+        newSymlinks = rsyncRoots(realPath)
+        # If root of source directory tree is a symlink itself mark it as visited
         logging.debug(f"source  : '{source}'")
         logging.debug(f"realPath: '{realPath}'")
+        rootsCopied = {realPath}
+        symlinksVisited = set()
         if realPath != source:
-            # cmdShell.run(f'ln -s {realPath} .{source}')
-            symlinksVisited.append(f'.{source}')
-        # Recursively detect all symlinks and rsync their targets
-        finished = False
-        while not finished:
-            finished = True
-            symlinksFound = cmdShell.run('find ./ -type l').out
-            logging.debug(f'symlinksFound >>>{symlinksFound}<<<')
-            logging.debug(f'symlinksVisited >>>{symlinksVisited}<<<')
-            if symlinksFound:
-                symlinksFound = symlinksFound.strip().split('\n')
-                realPaths = []
-                for symlink in symlinksFound:
-                    if (symlink not in symlinksVisited
-                            and symlink[1:] not in targets.keys()):  # skip leading '.'
-                        logging.debug(f'symlink >>>{symlink}<<<')
-                        linkTarget = os.readlink(symlink)
-                        logging.debug(f'linkTarget >>>{linkTarget}<<<')
-                        linkTarget = self._symlinkConvertRelToAbs(symlink, linkTarget)
-                        (realPath, targets) = self._getRealPathAndSymlinks(linkTarget, targets)
-                        if realPath not in realPaths:
-                            realPaths.append(realPath)
-                            logging.debug(f'realPaths: >>>{realPaths}<<<')
-                        symlinksVisited.append(symlink)
-                        finished = False
-                if realPaths:
-                    self._runRsync(realPaths, filterFilePath, verbose, dryRun)
+            symlinksVisited.add(f'.{source}')
+        # Iteratively rsync the targets of all symlinks which arrived in the previous pass
+        while newSymlinks:
+            logging.debug(f'newSymlinks >>>{newSymlinks}<<<')
+            realPaths = {}
+            for (symlink, linkTarget) in newSymlinks.items():
+                if symlink in symlinksVisited or symlink[1:] in targets:  # skip leading '.'
+                    continue
+                symlinksVisited.add(symlink)
+                linkTarget = self._symlinkConvertRelToAbs(symlink, linkTarget)
+                (realPath, targets) = self._getRealPathAndSymlinks(linkTarget, targets)
+                if realPath not in rootsCopied:
+                    rootsCopied.add(realPath)
+                    realPaths[realPath] = True
+            logging.debug(f'realPaths: >>>{list(realPaths)}<<<')
+            newSymlinks = {}
+            if realPaths:
+                newSymlinks = rsyncRoots(list(realPaths))
         # Copy all symlinks that were not yet copied
         logging.debug('Final rsync call')
         self._runRsync([s for (s, t) in targets.items() if t],
-                       filterFilePath, verbose, dryRun)
-        logging.info(f"Remote copy of '{source}' finished.")
+                       filterFilePath, verbose, dryRun, delete)
@@ -0,0 +1,161 @@
+# ------------------------------------------------------------------------
+# Copyright 2022 IBM Corp. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------------------------------------------------
+
+""" Catalog of the RPM package files contained in a directory """
+
+
+# Global modules
+
+import json
+import logging
+import os
+import struct
+import threading
+
+
+# Classes
+
+class RpmCatalog():
+    """ Map package names to the RPM package files of a directory
+
+        The package names are read directly from the RPM headers of the files.
+        The mapping is cached in memory and in a cache file in the user's home
+        directory; a file is only read again if its size or modification time
+        has changed, so that the catalog is shared between all tools.
+    """
+
+    _cacheFilePath = '~/.cache/soos/rpm-catalog.json'
+    _leadMagic     = b'\xed\xab\xee\xdb'
+    _headerMagic   = b'\x8e\xad\xe8\x01'
+    _tagName       = 1000
+    _catalogs      = {}
+    _catalogsLock  = threading.Lock()
+
+    @staticmethod
+    def get(path):
+        """ Get the catalog of directory path """
+        realPath = os.path.realpath(path)
+        with RpmCatalog._catalogsLock:
+            if realPath not in RpmCatalog._catalogs:
+                RpmCatalog._catalogs[realPath] = RpmCatalog(realPath)
+            catalog = RpmCatalog._catalogs[realPath]
+        catalog.refresh()
+        return catalog
+
+    def __init__(self, path):
+        self._path     = path
+        self._files    = {}  # file name -> [size, mtime in ns, package name or None]
+        self._packages = {}  # package name -> file name
+        self._lock     = threading.Lock()
+
+    def find(self, packageName):
+        """ Return the name of the file containing package packageName or None """
+        with self._lock:
+            return self._packages.get(packageName)
+
+    def refresh(self):
+        """ Update the catalog for files which were added, changed or removed """
+
+        with self._lock:
+            cached = self._loadCache() if not self._files else self._files
+
+            files   = {}
+            changed = False
+            for entry in os.scandir(self._path):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                prev = cached.get(entry.name)
+                if prev and prev[0] == stat.st_size and prev[1] == stat.st_mtime_ns:
+                    files[entry.name] = prev
+                else:
+                    files[entry.name] = [stat.st_size, stat.st_mtime_ns,
+                                         self._readPackageName(entry.path)]
+                    changed = True
+
+            changed = changed or files.keys() != cached.keys()
+
+            self._files    = files
+            self._packages = {v[2]: k for (k, v) in sorted(files.items()) if v[2]}
+
+            if changed:
+                self._saveCache()
+
+    def isEmpty(self):
+        """ True if the directory does not contain any files """
+        with self._lock:
+            return not self._files
+
+    def _readPackageName(self, filePath):
+        # Read the package name from the header of an RPM package file;
+        # returns None if the file is not an RPM package file
+
+        try:
+            # pylint: disable=invalid-name
+            with open(filePath, 'rb') as fh:
+                if fh.read(96)[:4] != self._leadMagic:
+                    return None
+
+                # Skip the signature header which is padded to a multiple of 8 bytes
+                (nIndex, storeSize) = self._readHeaderIntro(fh)
+                sigSize = 16 * nIndex + storeSize
+                fh.seek(sigSize + (8 - sigSize % 8) % 8, os.SEEK_CUR)
+
+                (nIndex, storeSize) = self._readHeaderIntro(fh)
+                index = fh.read(16 * nIndex)
+                store = fh.read(storeSize)
+
+            for i in range(nIndex):
+                (tag, _type, offset, _count) = struct.unpack('>iiii', index[16*i:16*(i+1)])
+                if tag == self._tagName:
+                    return store[offset:store.index(b'\0', offset)].decode()
+
+        except (OSError, ValueError, struct.error) as exp:
+            logging.debug(f"Could not read RPM header of '{filePath}': {exp}")
+
+        return None
+
+    def _readHeaderIntro(self, fh):
+        # Read magic, reserved bytes, number of index entries and size of data store
+        intro = fh.read(16)
+        if intro[:4] != self._headerMagic:
+            raise ValueError('bad header magic')
+        return struct.unpack('>ii', intro[8:16])
+
+    def _loadCache(self):
+        try:
+            # pylint: disable=invalid-name
+            with open(os.path.expanduser(self._cacheFilePath), encoding='utf-8') as fh:
+                return json.load(fh).get(self._path, {})
+        except (OSError, ValueError):
+            return {}
+
+    def _saveCache(self):
+        cacheFilePath = os.path.expanduser(self._cacheFilePath)
+        try:
+            # pylint: disable=invalid-name
+            try:
+                with open(cacheFilePath, encoding='utf-8') as fh:
+                    cache = json.load(fh)
+            except (OSError, ValueError):
+                cache = {}
+            cache[self._path] = self._files
+            os.makedirs(os.path.dirname(cacheFilePath), exist_ok=True)
+            with open(f'{cacheFilePath}.tmp', 'w', encoding='utf-8') as fh:
+                json.dump(cache, fh)
+            os.replace(f'{cacheFilePath}.tmp', cacheFilePath)
+        except OSError as exp:
+            logging.debug(f"Could not write RPM catalog cache '{cacheFilePath}': {exp}")
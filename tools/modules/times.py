@@ -44,10 +44,16 @@ def saveEndTime():
 
 def saveCurrentTime(label, traceback=None):
     """ Save current time together with a descriptive label """
+    saveTime(label, datetime.datetime.now(), traceback)
+
+
+def saveTime(label, timeStamp, traceback=None):
+    """ Save a time stamp taken before (e.g. by a worker thread) together with
+        a descriptive label; must be called from the main thread """
 
     time = types.SimpleNamespace()
     time.label = label
-    time.time = datetime.datetime.now()
+    time.time = timeStamp
 
     _getTimes(traceback).append(time)
 
@@ -46,6 +46,7 @@ from modules.command    import (
 from modules.exceptions import RpmFileNotFoundException
 from modules.fail       import fail
 from modules.quantity   import Quantity
+from modules.rpmcatalog import RpmCatalog
 from modules.nfstools     import (
     getOverlayBase,
     getValidNfsServerAddress
@@ -290,16 +291,12 @@ def getRpmFileForPackage(packageName, path):
 
     # do not use fail function here, cause verify-config uses this function too
     if os.path.exists(path):
-        pathContent = os.listdir(path)
-        if len(pathContent) < 1:
+        catalog = RpmCatalog.get(path)
+        if catalog.isEmpty():
             raise RpmFileNotFoundException(path, packageName, 'is empty.')
-        cmd = 'rpm -qp --queryformat "%{NAME}" '
-        for file in pathContent:
-            if os.path.isfile(path + '/' + file):
-                # check if rpm is found
-                packageNameFromRpm = CmdShell().run(cmd + path + '/' + file).out
-                if packageNameFromRpm == packageName:
-                    return file
+        file = catalog.find(packageName)
+        if file:
+            return file
     else:
         raise RpmFileNotFoundException(path, packageName, 'does not exist.')
     raise RpmFileNotFoundException(path, packageName,
@@ -384,8 +381,9 @@ def getCallingToolName():
     return traceback.format_stack()[0].split(',')[0].split(' ')[3].split('"')[1]
 
 
-def getParmsForDeploymentYamlFile(ctx, deployment):
-    """ returns parms for creating the deployment description file """
+def getParmsForDeploymentYamlFile(ctx, deployment, nfsAddress=None):
+    """ returns parms for creating the deployment description file;
+        nfsAddress: optional: IP address of the NFS server, determined if not specified """
     return {
         # The OCP project name
         'PROJECT': ctx.cf.ocp.project,
@@ -494,7 +492,7 @@ def getParmsForDeploymentYamlFile(ctx, deployment):
         # -- Parameters for mounting HANA DB database file systems --
 
         # IP address of the NFS server
-        'NFS_INTRANET_IP': getValidNfsServerAddress(ctx),
+        'NFS_INTRANET_IP': nfsAddress or getValidNfsServerAddress(ctx),
 
         # Parent dir on NFS Server
         'NFS_PARENT_DIR': getOverlayBase(ctx, deployment.overlayUuid),
@@ -19,12 +19,16 @@
 
 # Global modules
 
-# None
+import logging
 
 
 # Local modules
 
-from modules.command    import CmdSsh
+from modules.command    import (
+    AsyncCmdSsh,
+    CmdSsh,
+    runConcurrently
+)
 from modules.exceptions import RpmFileNotFoundException
 from modules.ocp        import Ocp
 from modules.fail       import fail
@@ -101,26 +105,24 @@ class Verify():
     def _checkSsh(self):
         success = True
         msg = ''
-        res = self._cmdSshNfs.run('true')
-        if res.rc != 0:
-            msg += self._cmdSshNfs.formatSshError(res,
-                                                  self._ctx.cf.nfs.host.name,
-                                                  self._ctx.cr.nfs.user)
-            success = False
 
-        res = self._cmdSshNws4.run('true')
-        if res.rc != 0:
-            msg += self._cmdSshNws4.formatSshError(res,
-                                                   self._ctx.cf.refsys.nws4.host.name,
-                                                   self._ctx.cr.refsys.nws4.sidadm)
-            success = False
+        # Check the SSH connections to all hosts concurrently
 
-        res = self._cmdSshHdb.run('true')
-        if res.rc != 0:
-            msg += self._cmdSshHdb.formatSshError(res,
-                                                  self._ctx.cf.refsys.hdb.host.name,
-                                                  self._ctx.cr.refsys.hdb.sidadm)
-            success = False
+        connections = [
+            (self._cmdSshNfs,  self._ctx.cf.nfs.host.name,         self._ctx.cr.nfs.user),
+            (self._cmdSshNws4, self._ctx.cf.refsys.nws4.host.name, self._ctx.cr.refsys.nws4.sidadm),
+            (self._cmdSshHdb,  self._ctx.cf.refsys.hdb.host.name,  self._ctx.cr.refsys.hdb.sidadm)
+        ]
+
+        results = runConcurrently([
+            AsyncCmdSsh(self._ctx, host, user, reuseCon=False).run('true')
+            for (_cmdSsh, host, user) in connections
+        ])
+
+        for ((cmdSsh, host, user), res) in zip(connections, results):
+            if res.rc != 0:
+                msg += cmdSsh.formatSshError(res, host, user)
+                success = False
 
         return success, msg
 
@@ -379,6 +381,7 @@ class VerifyOcp():
         self._ctx = ctx
         self._ocp = Ocp(self._ctx, login="admin", verify=True)
         self._workerNodes = self._ocp.getWorkerNodeList()
+        self._workerProbe = WorkerProbe(ctx, self._workerNodes)
 
     def __del__(self):
         del self._ocp
@@ -402,28 +405,6 @@ class VerifyOcp():
         return success
 
     # Private methods
-    def _runSshJumpCmd(self, worker, cmd):
-        ctx = self._ctx
-        innerSshCmd =  'ssh'
-        if ctx.cr.ocp.helper.user.sshid:
-            innerSshCmd += ' -i {ctx.cr.ocp.helper.user.sshid}'
-        innerSshCmd += ' -o StrictHostKeyChecking=no'
-        innerSshCmd += f' core@{worker} {cmd}'
-
-        helperHost  = ctx.cf.ocp.helper.host
-        helperUser  = ctx.cr.ocp.helper.user
-
-        res = CmdSsh(ctx, helperHost.name, helperUser, reuseCon=False).run(innerSshCmd)
-
-        rval = res.out
-
-        if res.rc != 0:
-            showMsgErr(f"Could not execute SSH command on worker node '{worker}'"
-                       f" as user '{helperUser.name}' on helper node '{helperHost.name}'")
-            showMsgInd(f"({res.err})")
-            rval = 'SSH CONNECT ERROR'
-
-        return rval
 
     def _verifySccForProject(self):
         serviceAccountList = self._ocp.getServiceAccountListForScc("anyuid")
@@ -460,7 +441,7 @@ class VerifyOcp():
     def _verifySeLinux(self):
         success = True
         for worker in self._workerNodes:
-            enforceState = self._runSshJumpCmd(worker, 'getenforce')
+            enforceState = self._workerProbe.get(worker, 'selinux')
             if enforceState in ('Permissive', 'Disabled'):
                 showMsgOk(f"SELinux setting for worker {worker} is valid.")
             else:
@@ -471,8 +452,8 @@ class VerifyOcp():
     def _verifyPidLimit(self):
         success = True
         for worker in self._workerNodes:
-            pidsLimit = self._runSshJumpCmd(worker, 'crio config | grep pids_limit')
-            pidsLimit = int(pidsLimit.split('=')[1])
+            pidsLimit = self._workerProbe.get(worker, 'pidsLimit')
+            pidsLimit = int(pidsLimit.split('=')[1]) if '=' in pidsLimit else 0
             if pidsLimit >= 8192:
                 showMsgOk(f"CRI-O pids_limit setting for worker {worker} is valid.")
             else:
@@ -480,3 +461,82 @@ class VerifyOcp():
                            "is too low, must be >= 8192.")
                 success = False
         return success
+
+
+class WorkerProbe():
+    """ Collect facts of OCP worker nodes
+
+        All facts of a worker node are collected with a single SSH hop
+        (helper node -> worker node). The worker nodes are probed
+        concurrently on first access; the facts are cached afterwards.
+    """
+
+    # Fact name -> command executed on the worker node
+    # (commands must not contain quotes)
+
+    facts = {
+        'selinux':   'getenforce',
+        'pidsLimit': 'crio config 2>/dev/null | grep pids_limit'
+    }
+
+    _marker = '@@soos-fact'
+
+    # Maximum number of worker nodes probed concurrently
+
+    _maxConcurrency = 8
+
+    def __init__(self, ctx, workers):
+        self._ctx     = ctx
+        self._workers = workers
+        self._facts   = None
+
+    # Public methods
+
+    def get(self, worker, fact):
+        """ Get the output of the command for <fact> on <worker>;
+            'SSH CONNECT ERROR' if the worker could not be probed """
+        if self._facts is None:
+            self._facts = dict(zip(self._workers, runConcurrently(
+                [self._probe(worker) for worker in self._workers],
+                limit=WorkerProbe._maxConcurrency
+            )))
+        return self._facts[worker].get(fact, '')
+
+    # Private methods
+
+    async def _probe(self, worker):
+        ctx = self._ctx
+
+        script = '; '.join(f'echo {WorkerProbe._marker} {name}; {cmd}'
+                           for (name, cmd) in WorkerProbe.facts.items())
+
+        innerSshCmd =  'ssh'
+        if ctx.cr.ocp.helper.user.sshid:
+            innerSshCmd += f' -i {ctx.cr.ocp.helper.user.sshid}'
+        innerSshCmd += ' -o StrictHostKeyChecking=no'
+        innerSshCmd += f' core@{worker} "{script}"'
+
+        helperHost  = ctx.cf.ocp.helper.host
+        helperUser  = ctx.cr.ocp.helper.user
+
+        res = await AsyncCmdSsh(ctx, helperHost.name, helperUser, reuseCon=False).run(innerSshCmd)
+
+        if res.rc != 0 and WorkerProbe._marker not in res.out:
+            showMsgErr(f"Could not execute SSH command on worker node '{worker}'"
+                       f" as user '{helperUser.name}' on helper node '{helperHost.name}'")
+            showMsgInd(f"({res.err})")
+            return {name: 'SSH CONNECT ERROR' for name in WorkerProbe.facts}
+
+        facts = {}
+        name  = None
+        for line in res.out.split('\n'):
+            if line.startswith(f'{WorkerProbe._marker} '):
+                name = line.split()[1]
+                facts[name] = []
+            elif name:
+                facts[name].append(line)
+
+        facts = {name: '\n'.join(lines).strip() for (name, lines) in facts.items()}
+        logging.debug(f"Facts of worker node '{worker}': {facts}")
+
+        return facts